@@ -2,8 +2,6 @@
 import streamlit as st
 
 from config import ADMIN_KEY
-from components.admin_view import show_admin
-from components.signin_view import show_signin
 # 🔥 Import the new optimized loader
 from core.state import ensure_data_loaded, ensure_signin_data_loaded, init_data
 
@@ -18,11 +16,15 @@ admin_access_param = query_params.get("admin_access", None)
 if mid_param:
     # 🔥 OPTIMIZATION: Use the faster loader here
     ensure_signin_data_loaded()
+    # Attendees far outnumber admins: only load the sign-in view on this route
+    from components.signin_view import show_signin
     show_signin(mid_param)
 elif (admin_access_param == ADMIN_KEY) or st.session_state.is_admin:
     st.session_state.is_admin = True
     # Admin still needs the heavy loader
     ensure_data_loaded()
+    # Admin view pulls in fpdf, qrcode and the GAS helpers; load on first use
+    from components.admin_view import show_admin
     show_admin()
 else:
     st.error("⛔ Access Denied. Please scan a valid meeting QR code or use the Admin link.")
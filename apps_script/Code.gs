@@ -6,6 +6,14 @@
 // IMPORTANT:
 // Apps Script Web Apps don't reliably expose request headers.
 // Streamlit MUST include api_key in JSON body (POST) and query (GET download).
+//
+// Protocol versions (reported by ?action=ping):
+//   1: JSON body with data_base64 (800000-char limit), JSON download.
+//   2: adds chunked, resumable uploads (upload_chunk / upload_status with
+//      parameters in the query string and raw base64 text as the body) and
+//      download&format=b64 returning plain text. Web Apps can neither receive
+//      nor return raw binary reliably, so base64 text is the leanest encoding.
+var PROTOCOL_VERSION = 2;
 
 function _json(obj) {
   return ContentService
@@ -21,7 +29,7 @@ function _apiKey_() {
 function doGet(e) {
   var action = (e && e.parameter && e.parameter.action) ? e.parameter.action : "ping";
   if (action === "ping") {
-    return _json({ ok: true, message: "pong" });
+    return _json({ ok: true, message: "pong", protocol: PROTOCOL_VERSION });
   }
 
   if (action === "download") {
@@ -38,6 +46,10 @@ function doGet(e) {
       var file = DriveApp.getFileById(fileId);
       var blob = file.getBlob();
       var b64 = Utilities.base64Encode(blob.getBytes());
+      // Protocol 2: plain-text base64 body, no JSON envelope (errors stay JSON)
+      if (e.parameter.format === "b64") {
+        return ContentService.createTextOutput(b64).setMimeType(ContentService.MimeType.TEXT);
+      }
       return _json({ ok: true, mimeType: blob.getContentType(), data_base64: b64 });
     } catch (err) {
       return _json({ ok: false, error: String(err) });
@@ -49,19 +61,38 @@ function doGet(e) {
 
 function doPost(e) {
   try {
+    var expected = _apiKey_();
+    if (!expected) return _json({ ok: false, error: "API_KEY not set in Script Properties" });
+
+    // Protocol 2: parameters in the query string, body is the raw base64 text (no JSON)
+    var params = (e && e.parameter) ? e.parameter : {};
+    if (params.action) {
+      var res;
+      if ((params.api_key || "") !== expected) res = { ok: false, error: "Unauthorized" };
+      else if (params.action === "upload_chunk") res = _uploadChunk_(params, (e.postData && e.postData.contents) || "");
+      else if (params.action === "upload_status") res = _uploadStatus_(params);
+      else res = { ok: false, error: "Unknown action" };
+      // Clients detect the protocol from this field instead of pinging first;
+      // an older bridge answers these requests with a JSON parse error and no protocol.
+      res.protocol = PROTOCOL_VERSION;
+      return _json(res);
+    }
+
+    // Protocol 1: JSON body
     var body = {};
     if (e && e.postData && e.postData.contents) {
       body = JSON.parse(e.postData.contents);
     }
 
-    var expected = _apiKey_();
-    if (!expected) return _json({ ok: false, error: "API_KEY not set in Script Properties" });
-
     if ((body.api_key || "") !== expected) {
       return _json({ ok: false, error: "Unauthorized" });
     }
 
-    if ((body.action || "") !== "upload") {
+    var action = body.action || "";
+    if (action === "sweep") {
+      return _json(_sweep_(body));
+    }
+    if (action !== "upload") {
       return _json({ ok: false, error: "Unknown action" });
     }
 
@@ -78,15 +109,170 @@ function doPost(e) {
       return _json({ ok: false, error: "Payload too large" });
     }
 
+    return _json(_storeUpload_(folderId, body.uploadKey || "", filename, mimeType, dataB64));
+
+  } catch (err) {
+    return _json({ ok: false, error: String(err), protocol: PROTOCOL_VERSION });
+  }
+}
+
+// Idempotent upload: the same key (content hash + meeting + attendee) always
+// returns the first file instead of writing a duplicate on client retries.
+// The Drive search, decode and createFile run unlocked so concurrent sign-ins
+// don't queue; only the cache-only reservation below is serialized.
+function _storeUpload_(folderId, uploadKey, filename, mimeType, dataB64) {
+  var folder = DriveApp.getFolderById(folderId);
+  var cache = CacheService.getScriptCache();
+  if (uploadKey) {
+    var existingId = _findUpload_(folder, uploadKey, filename);
+    if (existingId) return { ok: true, fileId: existingId, duplicate: true };
+    var claim = _reserveUpload_(uploadKey);
+    if (claim.fileId) return { ok: true, fileId: claim.fileId, duplicate: true };
+    if (claim.busy) return { ok: false, error: "Upload in progress, retry shortly" };
+  }
+
+  try {
     var bytes = Utilities.base64Decode(dataB64);
     var blob = Utilities.newBlob(bytes, mimeType, filename);
-
-    var folder = DriveApp.getFolderById(folderId);
     var file = folder.createFile(blob);
+    if (uploadKey) {
+      file.setDescription(uploadKey);
+      // Published before the reservation is dropped, so a later claim sees the file
+      cache.put("upload:" + uploadKey, file.getId(), 21600);
+    }
+    return { ok: true, fileId: file.getId() };
+  } finally {
+    if (uploadKey) cache.remove("reserve:" + uploadKey);
+  }
+}
 
-    return _json({ ok: true, fileId: file.getId() });
+// Outlives any single createFile; a crashed request's claim simply expires.
+var UPLOAD_RESERVE_SECONDS = 120;
 
-  } catch (err) {
-    return _json({ ok: false, error: String(err) });
+// Claim uploadKey for this request. Holds the script lock for two cache reads
+// and a write only. Returns { fileId } if the key was stored meanwhile,
+// { busy: true } if another request holds it, or {} once reserved.
+function _reserveUpload_(uploadKey) {
+  var cache = CacheService.getScriptCache();
+  var lock = LockService.getScriptLock();
+  lock.waitLock(5000);
+  try {
+    var doneId = cache.get("upload:" + uploadKey);
+    if (doneId) return { fileId: doneId };
+    if (cache.get("reserve:" + uploadKey)) return { busy: true };
+    cache.put("reserve:" + uploadKey, "1", UPLOAD_RESERVE_SECONDS);
+    return {};
+  } finally {
+    lock.releaseLock();
+  }
+}
+
+// ---- Protocol 2: chunked, resumable upload ----
+// Chunks are held in the script cache (values up to 100 KB, kept 6 h) under
+// the uploadId (the client's uploadKey). The file is created once all arrive.
+var CHUNK_MAX_CHARS = 100000;
+var CHUNK_MAX_COUNT = 64;
+
+function _chunkKeys_(uploadId, total) {
+  var keys = [];
+  for (var i = 0; i < total; i++) keys.push("chunk:" + uploadId + ":" + i);
+  return keys;
+}
+
+function _receivedChunks_(uploadId, total) {
+  var got = CacheService.getScriptCache().getAll(_chunkKeys_(uploadId, total));
+  var received = [];
+  for (var i = 0; i < total; i++) {
+    if (got["chunk:" + uploadId + ":" + i] != null) received.push(i);
+  }
+  return { chunks: got, received: received };
+}
+
+function _uploadStatus_(p) {
+  var uploadId = p.uploadId || "";
+  var total = Number(p.total) || 0;
+  if (!uploadId || !p.folderId) return { ok: false, error: "Missing uploadId/folderId" };
+
+  var existingId = _findUpload_(DriveApp.getFolderById(p.folderId), uploadId, p.filename || "");
+  if (existingId) return { ok: true, complete: true, fileId: existingId };
+  return { ok: true, complete: false, received: _receivedChunks_(uploadId, total).received };
+}
+
+function _uploadChunk_(p, data) {
+  var uploadId = p.uploadId || "";
+  var index = Number(p.index);
+  var total = Number(p.total);
+  if (!uploadId || !p.folderId || !p.filename) return { ok: false, error: "Missing uploadId/folderId/filename" };
+  if (!(total >= 1 && total <= CHUNK_MAX_COUNT) || !(index >= 0 && index < total)) {
+    return { ok: false, error: "Bad chunk index/total" };
+  }
+  if (data.length > CHUNK_MAX_CHARS) return { ok: false, error: "Chunk too large" };
+
+  var cache = CacheService.getScriptCache();
+  var doneId = cache.get("upload:" + uploadId);
+  if (doneId) return { ok: true, complete: true, fileId: doneId, duplicate: true };
+
+  cache.put("chunk:" + uploadId + ":" + index, data, 21600);
+
+  var state = _receivedChunks_(uploadId, total);
+  if (state.received.length < total) {
+    return { ok: true, complete: false, received: state.received };
+  }
+
+  var parts = [];
+  for (var i = 0; i < total; i++) parts.push(state.chunks["chunk:" + uploadId + ":" + i]);
+  var res = _storeUpload_(p.folderId, uploadId, p.filename, p.mimeType || "image/png", parts.join(""));
+  // Keep the chunks while another request holds the key, so a retry can still assemble
+  if (!res.ok) return res;
+  cache.removeAll(_chunkKeys_(uploadId, total));
+  res.complete = true;
+  return res;
+}
+
+// Recent keys are answered from the script cache (6 h); older ones from the
+// deterministic filename, confirmed by the key stored in the file description.
+function _findUpload_(folder, uploadKey, filename) {
+  var cache = CacheService.getScriptCache();
+  var cached = cache.get("upload:" + uploadKey);
+  if (cached) {
+    try {
+      if (!DriveApp.getFileById(cached).isTrashed()) return cached;
+    } catch (err) {}
+    // Trashed or gone: forget it so the upload can be stored again
+    cache.remove("upload:" + uploadKey);
+  }
+  var files = folder.getFilesByName(filename);
+  while (files.hasNext()) {
+    var f = files.next();
+    if (!f.isTrashed() && f.getDescription() === uploadKey) return f.getId();
+  }
+  return "";
+}
+
+// Trash signature files in the folder that no sheet row references.
+// Files newer than graceHours are kept: their sheet write may still be pending.
+function _sweep_(body) {
+  var folderId = body.folderId;
+  if (!folderId) return { ok: false, error: "Missing folderId" };
+
+  var referenced = {};
+  (body.referencedIds || []).forEach(function (id) { referenced[id] = true; });
+  var graceMs = (Number(body.graceHours) || 24) * 3600 * 1000;
+  var cutoff = new Date().getTime() - graceMs;
+  var dryRun = body.dryRun !== false;
+
+  var scanned = 0, orphans = 0, trashed = 0;
+  var files = DriveApp.getFolderById(folderId).getFiles();
+  while (files.hasNext()) {
+    var f = files.next();
+    if (f.getName().indexOf("signature_") !== 0) continue;
+    scanned++;
+    if (referenced[f.getId()] || f.getDateCreated().getTime() > cutoff) continue;
+    orphans++;
+    if (!dryRun) {
+      f.setTrashed(true);
+      trashed++;
+    }
   }
+  return { ok: true, scanned: scanned, orphans: orphans, trashed: trashed };
 }
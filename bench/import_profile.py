@@ -0,0 +1,88 @@
+"""
+Import-time profile for the two app routes.
+
+Runs each route's view module in a fresh interpreter under `python -X importtime`
+and appends a report to bench_output.txt (repo root). Exits non-zero if the
+sign-in route pulls in a module that only the admin route needs.
+
+Usage:
+    python bench/import_profile.py
+"""
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT = os.path.join(ROOT, "bench_output.txt")
+
+ROUTES = {
+    "signin (?mid=)": "components.signin_view",
+    "admin": "components.admin_view",
+}
+
+# Modules the attendee route must never load at import time
+SIGNIN_FORBIDDEN = ("fpdf", "qrcode", "components.admin_view", "services.pdf_service")
+
+TOP_N = 12
+
+def profile_module(module: str):
+    """Return (total_ms, [(cumulative_us, name)], loaded_modules) or raise RuntimeError."""
+    code = f"import sys; import {module}; print('\\n'.join(sorted(sys.modules)))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        last = proc.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        raise RuntimeError(last[0])
+
+    entries = []
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative = int(parts[1].strip())
+        raw_name = parts[2].rstrip()
+        name = raw_name.strip()
+        # Top-level imports have exactly one leading space; nested ones are indented further
+        if len(raw_name) - len(raw_name.lstrip()) == 1:
+            total_us += cumulative
+            entries.append((cumulative, name))
+    entries.sort(reverse=True)
+    loaded = set(proc.stdout.split())
+    return total_us / 1000.0, entries[:TOP_N], loaded
+
+def main() -> int:
+    lines = [f"== Import-time profile ({datetime.now():%Y-%m-%d %H:%M:%S}, {sys.executable}) =="]
+    failed = False
+    for label, module in ROUTES.items():
+        try:
+            total_ms, top, loaded = profile_module(module)
+        except RuntimeError as e:
+            lines.append(f"[{label}] {module}: import failed: {e}")
+            failed = True
+            continue
+
+        lines.append(f"[{label}] {module}: {total_ms:.1f} ms total")
+        for cumulative, name in top:
+            lines.append(f"    {cumulative / 1000.0:8.1f} ms  {name}")
+
+        if module == ROUTES["signin (?mid=)"]:
+            leaked = [m for m in SIGNIN_FORBIDDEN if m in loaded]
+            if leaked:
+                lines.append(f"    !! sign-in route loads admin-only modules: {', '.join(leaked)}")
+                failed = True
+    lines.append("")
+
+    report = "\n".join(lines)
+    print(report)
+    with open(OUTPUT, "a", encoding="utf-8") as f:
+        f.write(report + "\n")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
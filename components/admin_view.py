@@ -1,32 +1,33 @@
-import os
-import random
 import time
 from datetime import datetime
 
-import gspread
 import pandas as pd
 import streamlit as st
-from fpdf import FPDF
-import requests
 
-from config import DEPLOYMENT_URL, FONT_CH, GAS_UPLOAD_URL, GAS_API_KEY, GAS_FOLDER_ID
+from config import DEPLOYMENT_URL, SIGNATURE_ASYNC_COMMIT
 from core.connection import get_sheet_object
-from core.state import refresh_all_data
-from services.pdf_service import generate_qr_card
-from utils import image_from_signature_value, map_dict_to_row, safe_int, safe_str
-from utils import make_white_background_transparent, base64_to_image
+from core.state import get_employee_index, refresh_all_data, set_meetings_status, sync_changes
+from services.data_service import sweep_orphan_signatures
+from services.export_service import bulk_export_zip, select_meetings
+from services.journal_service import STATE_COMMITTED, STATE_FAILED, journal_states, retry_failed
+from services.pdf_service import generate_attendance_pdf, generate_qr_card
+from utils import export_filename, gas_ping, map_dict_to_row
 
 @st.cache_data(ttl=300)
 def _gas_ping():
-    if not GAS_UPLOAD_URL:
-        return False, "Missing gas.upload_url"
-    try:
-        r = requests.get(GAS_UPLOAD_URL, params={"action": "ping"}, timeout=10)
-        r.raise_for_status()
-        js = r.json()
-        return bool(js.get("ok")), js.get("message","")
-    except Exception as e:
-        return False, str(e)
+    # (online, message, protocol version); display only, uploads detect the protocol themselves
+    return gas_ping()
+
+# Each tick costs one Drive metadata request; Sheets is read only when something changed
+AUTO_REFRESH_SECONDS = 20
+
+@st.fragment(run_every=AUTO_REFRESH_SECONDS)
+def _auto_refresh_probe():
+    # Without attendee data sync_changes falls back to a full reload; don't loop on that
+    df_att = st.session_state.df_att
+    if df_att is not None and not df_att.empty and sync_changes():
+        st.rerun()
+    st.caption(f"Live · last checked {datetime.now():%H:%M:%S}")
 
 def show_admin():
     st.sidebar.title("Navigation")
@@ -34,17 +35,49 @@ def show_admin():
     st.sidebar.divider()
 
     st.sidebar.subheader("Signature Storage (GAS)")
-    ok, msg = _gas_ping()
+    ok, msg, protocol = _gas_ping()
     if ok:
-        st.sidebar.success("✅ GAS online")
+        st.sidebar.success(f"✅ GAS online (protocol v{protocol})")
+        if protocol < 2:
+            st.sidebar.caption("Redeploy apps_script/Code.gs for chunked uploads.")
     else:
         st.sidebar.error("❌ GAS offline")
         st.sidebar.caption(msg)
 
+    with st.sidebar.expander("🧹 Orphan Signatures"):
+        st.caption("Drive files not referenced by any attendee row (older than 24 h).")
+        if st.button("Scan", key="sweep_scan"):
+            try:
+                st.session_state.sweep_result = sweep_orphan_signatures(dry_run=True)
+            except Exception as e:
+                st.session_state.sweep_result = None
+                st.error(f"Scan failed: {e}")
+        sweep = st.session_state.get("sweep_result")
+        if sweep:
+            st.write(f"{sweep.get('orphans', 0)} orphan(s) of {sweep.get('scanned', 0)} files")
+            if sweep.get("orphans") and st.button("🗑️ Move orphans to trash", key="sweep_run"):
+                try:
+                    done = sweep_orphan_signatures(dry_run=False)
+                    st.session_state.sweep_result = None
+                    st.success(f"Trashed {done.get('trashed', 0)} file(s).")
+                except Exception as e:
+                    st.error(f"Sweep failed: {e}")
+
+    if SIGNATURE_ASYNC_COMMIT:
+        st.sidebar.subheader("Signature Journal")
+        j_states = [e["state"] for e in journal_states().values()]
+        j_failed = j_states.count(STATE_FAILED)
+        j_pending = len(j_states) - j_failed - j_states.count(STATE_COMMITTED)
+        st.sidebar.caption(f"⏳ {j_pending} pending · ⚠️ {j_failed} failed")
+        if j_failed and st.sidebar.button("🔁 Retry failed signatures"):
+            retry_failed()
+            st.rerun()
+
     if st.sidebar.button("🔄 Refresh Data (Sync)"):
-        refresh_all_data()
+        # Only reloads what changed since the last sync (see core.state.sync_changes)
+        changed = sync_changes(include_master=True)
         st.session_state.meeting_limit = 10
-        st.sidebar.success("Updated!")
+        st.sidebar.success("Updated!" if changed else "Already up to date.")
         time.sleep(1)
         st.rerun()
 
@@ -73,9 +106,7 @@ def show_admin():
             st.success(f"🎉 Meeting Created: **{lm['name']}** (ID: {lm['id']})")
 
             card_bytes = generate_qr_card(lm['url'], lm['name'], lm['loc'], lm['time'])
-            clean_date = str(lm['date']).replace("-", "").replace("/", "")
-            clean_name = str(lm['name']).replace(" ", "_")
-            qr_filename = f"{clean_date}_{clean_name}_{lm['id']}.png"
+            qr_filename = export_filename(lm['date'], lm['name'], lm['id'], "png")
 
             c1, c2 = st.columns(2)
             with c1: st.image(card_bytes, caption="Preview", width=250)
@@ -102,26 +133,23 @@ def show_admin():
 
         st.subheader("Select Attendees")
 
-        depts = []
-        if "Department" in df_master.columns:
-            depts = sorted(df_master["Department"].astype(str).unique().tolist())
-        sel_dept = st.multiselect("Filter by Department", depts)
+        emp_index = get_employee_index()
 
-        filtered_emp = df_master.copy()
-        if sel_dept:
-            filtered_emp = filtered_emp[filtered_emp["Department"].astype(str).isin(sel_dept)]
+        def add_departments(depts):
+            # Runs before the Attendees widget is rebuilt, so its state can be set here
+            st.session_state.form_selected = list(dict.fromkeys(st.session_state.form_selected + emp_index.members(depts)))
 
-        if "RankID" in filtered_emp.columns:
-            filtered_emp["RankID_Int"] = filtered_emp["RankID"].apply(lambda x: safe_int(x, 999))
-            filtered_emp = filtered_emp.sort_values("RankID_Int")
+        d1, d2 = st.columns([3, 1])
+        sel_dept = d1.multiselect("Filter by Department", emp_index.departments)
+        d2.write("")
+        d2.button("➕ Add whole department", disabled=not sel_dept, on_click=add_departments, args=(sel_dept,))
+        name_query = st.text_input("Search name")
 
-        filtered_names = filtered_emp["FullName"].astype(str).tolist()
-        current_selection = st.session_state.form_selected
-        combined_options, seen = [], set()
-        for n in filtered_names + current_selection:
-            if n not in seen:
-                combined_options.append(n)
-                seen.add(n)
+        filtered_names = emp_index.members(sel_dept) if sel_dept else emp_index.names
+        if name_query:
+            filtered_names = emp_index.search(name_query, pool=filtered_names)
+        # Keep current picks selectable even when they fall outside the filter
+        combined_options = list(dict.fromkeys(filtered_names + st.session_state.form_selected))
 
         selected_names = st.multiselect("Attendees", combined_options, key="form_selected")
         st.divider()
@@ -156,8 +184,8 @@ def show_admin():
 
             rows = []
             for n in selected_names:
-                emp = df_master[df_master["FullName"].astype(str) == n].iloc[0]
-                rid = safe_int(emp.get("RankID"), 999)
+                emp = emp_index.records[n]
+                rid = emp_index.rank[n]
                 rows.append(map_dict_to_row(att_cols, {
                     "AttendeeName": n, "JobTitle": emp.get("JobTitle",""),
                     "MeetingID": new_id, "RankID": rid, "Status": "Pending", "SignatureBase64": ""
@@ -179,9 +207,40 @@ def show_admin():
     # ---- Meeting Control ----
     elif menu == "🛡️ Meeting Control":
         st.title("Meeting Control")
+        if st.toggle(f"⏱️ Auto-refresh (every {AUTO_REFRESH_SECONDS} s)", key="auto_refresh"):
+            _auto_refresh_probe()
         df_info = st.session_state.df_info
         df_att = st.session_state.df_att
 
+        with st.expander("📦 Bulk Export (PDFs + QR cards as ZIP)"):
+            b1, b2, b3 = st.columns(3)
+            bx_from = b1.date_input("From", value=None, key="bx_from")
+            bx_to = b2.date_input("To", value=None, key="bx_to")
+            bx_ids = b3.text_input("Meeting IDs (comma-separated, optional)", key="bx_ids")
+            if st.button("📦 Build ZIP", disabled=not (bx_from or bx_to or bx_ids.strip())):
+                # One snapshot for the whole batch instead of a resync per meeting
+                refresh_all_data()
+                ids = [i.strip() for i in bx_ids.split(",") if i.strip()]
+                selected = select_meetings(st.session_state.df_info, bx_from, bx_to, ids)
+                if selected.empty:
+                    st.warning("No meetings match this filter.")
+                else:
+                    bar = st.progress(0.0, text="Starting...")
+                    def on_progress(done, total, label):
+                        bar.progress(done / total if total else 1.0, text=f"{done}/{total} · {label}")
+                    try:
+                        st.session_state.bulk_export = (
+                            bulk_export_zip(selected, st.session_state.df_att, progress=on_progress),
+                            f"esign_export_{bx_from or ''}_{bx_to or ''}.zip".replace("-", ""),
+                            len(selected),
+                        )
+                    except Exception as e:
+                        st.session_state.bulk_export = None
+                        st.error(f"Bulk export failed: {e}")
+            if st.session_state.get("bulk_export"):
+                zip_bytes, zip_name, zip_count = st.session_state.bulk_export
+                st.download_button(f"📥 Download ZIP ({zip_count} meetings)", zip_bytes, zip_name, "application/zip", type="primary")
+
         c1, c2 = st.columns(2)
         s_id = c1.text_input("ID Filter")
         s_date = c2.date_input("Date Filter", value=None)
@@ -192,10 +251,40 @@ def show_admin():
             results["m"] = pd.to_numeric(results["MeetingID"], errors='coerce')
 
         results = results.sort_values(by=["d_obj", "m"], ascending=[False, False])
+        all_meetings = results.drop_duplicates(subset=['MeetingID'])
         if s_id: results = results[results["MeetingID"].astype(str) == s_id]
         if s_date: results = results[results["d_obj"] == s_date]
         results = results.drop_duplicates(subset=['MeetingID'])
 
+        # Per-signature journal state (optimistic sign-in); empty when the mode is off
+        j_entries = journal_states() if SIGNATURE_ASYNC_COMMIT else {}
+
+        with st.expander("🗂️ Bulk Status"):
+            labels = {str(r["MeetingID"]): f"{r['MeetingID']} | {str(r['d_obj']).replace('-', '/')} | {r['MeetingName']} ({r.get('MeetingStatus', 'Open')})"
+                      for _, r in all_meetings.iterrows()}
+            bs_mode = st.radio("Select by", ["Before date", "Pick meetings"], horizontal=True, key="bs_mode")
+            bs_status = st.selectbox("Set status to", ["Close", "Open"], key="bs_status")
+            if bs_mode == "Before date":
+                bs_before = st.date_input("Meetings dated before", value=None, key="bs_before")
+                bs_ids = [] if not bs_before else [
+                    str(r["MeetingID"]) for _, r in all_meetings.iterrows()
+                    if pd.notna(r["d_obj"]) and r["d_obj"] < bs_before and r.get("MeetingStatus", "Open") != bs_status
+                ]
+            else:
+                bs_ids = st.multiselect("Meetings", list(labels), format_func=labels.get, key="bs_pick")
+            st.caption(f"{len(bs_ids)} meeting(s) will be set to {bs_status}.")
+            if st.button("Apply", disabled=not bs_ids, key="bs_apply"):
+                try:
+                    written, missing = set_meetings_status(bs_ids, bs_status)
+                    st.session_state.bulk_status_msg = f"Set {len(written)} meeting(s) to {bs_status}." + (
+                        f" Not found on server: {', '.join(missing)}" if missing else "")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Operation failed: {e}")
+            if st.session_state.get("bulk_status_msg"):
+                st.success(st.session_state.bulk_status_msg)
+                st.session_state.bulk_status_msg = None
+
         limit = st.session_state.meeting_limit
         display_results = results.head(limit) if (not s_id and not s_date) else results
         if not s_id and not s_date:
@@ -211,47 +300,36 @@ def show_admin():
             total_count = len(att_subset)
             signed_count = len(att_subset[att_subset["Status"] == "Signed"])
 
+            m_journal = {name: e for (mid, name), e in j_entries.items() if mid == m_id and e["state"] != STATE_COMMITTED}
+            failed_count = sum(1 for e in m_journal.values() if e["state"] == STATE_FAILED)
+            pending_count = len(m_journal) - failed_count
+
             status_icon = "🟢" if status == "Open" else "🔴"
             title_str = f"{status_icon} {m_date} | {m_name} | {signed_count}/{total_count} Signed"
+            if pending_count: title_str += f" | ⏳ {pending_count} pending"
+            if failed_count: title_str += f" | ⚠️ {failed_count} failed"
 
             with st.expander(title_str):
+                if m_journal:
+                    st.caption("Signatures accepted at the door but not yet committed to the sheet (not in the PDF yet):")
+                    st.dataframe(pd.DataFrame([
+                        {"Attendee": name, "State": e["state"], "Attempts": e["attempts"], "Last Error": e["error"]}
+                        for name, e in m_journal.items()
+                    ]), hide_index=True, width="stretch")
+                    if failed_count and st.button("🔁 Retry failed", key=f"j_retry_{m_id}"):
+                        retry_failed(m_id)
+                        st.rerun()
+
                 r1, r2, r3 = st.columns([1, 1, 2])
 
                 with r1:
                     if st.button(f"{'🔒 Close' if status=='Open' else '🔓 Open'}", key=f"btn_lock_{m_id}"):
                         new_status = "Close" if status == "Open" else "Open"
                         try:
-                            ws_info = get_sheet_object("Meeting_Info")
-                            all_vals = []
-                            for i in range(3):
-                                try:
-                                    all_vals = ws_info.get_all_values()
-                                    break
-                                except gspread.exceptions.APIError as e:
-                                    if "429" in str(e): time.sleep(2)
-                                    elif i == 2: raise
-
-                            headers = all_vals[0]
-                            id_idx = headers.index("MeetingID")
-                            status_idx = headers.index("MeetingStatus") + 1
-
-                            row_idx = -1
-                            for i, r in enumerate(all_vals):
-                                if i==0: continue
-                                if safe_str(r[id_idx]) == m_id:
-                                    row_idx = i + 1
-                                    break
-
-                            if row_idx > 0:
-                                for i in range(3):
-                                    try:
-                                        ws_info.update_cell(row_idx, status_idx, new_status)
-                                        break
-                                    except gspread.exceptions.APIError as e:
-                                        if "429" in str(e): time.sleep(2)
-                                        elif i == 2: raise
-
-                                refresh_all_data()
+                            _, missing = set_meetings_status([m_id], new_status)
+                            if missing:
+                                st.error(f"Meeting {m_id} not found on server.")
+                            else:
                                 st.rerun()
                         except Exception as e:
                             st.error(f"Operation failed: {e}")
@@ -259,21 +337,17 @@ def show_admin():
                 with r2:
                     m_url = f"https://{DEPLOYMENT_URL}/?mid={m_id}"
                     qr_bytes = generate_qr_card(m_url, str(m_name), str(m.get('Location')), str(m.get('TimeRange')))
-                    clean_date_fn = str(m.get('MeetingDate')).replace("-", "").replace("/", "")
-                    clean_name_fn = str(m_name).replace(" ", "_")
-                    qr_fname = f"{clean_date_fn}_{clean_name_fn}_{m_id}.png"
+                    qr_fname = export_filename(m.get('MeetingDate'), m_name, m_id, "png")
                     st.download_button("📥 Download QR", qr_bytes, qr_fname, "image/png", key=f"qr_dl_{m_id}")
 
                 with r3:
                     pdf_key = f"pdf_{m_id}"
                     if pdf_key in st.session_state.pdf_cache:
-                        clean_date_fn = str(m.get('MeetingDate')).replace("-", "").replace("/", "")
-                        clean_name_fn = str(m_name).replace(" ", "_")
-                        fname = f"{clean_date_fn}_{clean_name_fn}_{m_id}.pdf"
+                        fname = export_filename(m.get('MeetingDate'), m_name, m_id, "pdf")
                         st.download_button("📥 Download PDF", st.session_state.pdf_cache[pdf_key], fname, "application/pdf", key=f"dl_{m_id}")
                     else:
                         if st.button("📄 Generate PDF", key=f"gen_{m_id}"):
-                            refresh_all_data()
+                            sync_changes(force_meetings=[m_id])
                             fresh_info = st.session_state.df_info
                             fresh_att = st.session_state.df_att
 
@@ -282,53 +356,10 @@ def show_admin():
                                 st.error("Sync Error. Try again.")
                                 st.stop()
                             fresh_m = fresh_m_list.iloc[0]
-                            fresh_att_subset = fresh_att[fresh_att["MeetingID"].astype(str) == m_id].copy()
+                            fresh_att_subset = fresh_att[fresh_att["MeetingID"].astype(str) == m_id]
 
                             with st.spinner("Generating..."):
-                                if "RankID" in fresh_att_subset.columns:
-                                    fresh_att_subset["RankID_Int"] = fresh_att_subset["RankID"].apply(lambda x: safe_int(x, 999))
-                                    fresh_att_subset = fresh_att_subset.sort_values("RankID_Int")
-
-                                pdf = FPDF()
-                                pdf.add_page()
-                                pdf.add_font('CustomFont', '', FONT_CH, uni=True)
-                                pdf.set_font('CustomFont', '', 24)
-
-                                pdf.multi_cell(w=0, h=12, txt=f"{fresh_m.get('MeetingName')}簽到", align="C")
-                                pdf.set_x(10)
-                                pdf.set_font_size(14)
-
-                                t_range = str(fresh_m.get('TimeRange', ''))
-                                display_time = f"時間：{t_range}" if "/" in t_range else f"時間：{str(fresh_m.get('MeetingDate')).replace('-', '/')} {t_range}"
-                                pdf.cell(0, 10, display_time, ln=True, align="C")
-                                pdf.cell(0, 10, f"地點：{fresh_m.get('Location')}", ln=True, align="C")
-                                pdf.ln(5)
-
-                                pdf.set_fill_color(230, 230, 230)
-                                pdf.set_font_size(16)
-                                pdf.cell(80, 12, "出席人員", 1, 0, 'C', True)
-                                pdf.cell(110, 12, "簽名", 1, 1, 'C', True)
-
-                                for i, row in fresh_att_subset.reset_index().iterrows():
-                                    pdf.cell(80, 25, str(row.get('AttendeeName')), 1, 0, 'C')
-                                    x, y = pdf.get_x(), pdf.get_y()
-                                    pdf.cell(110, 25, "", 1, 1)
-
-                                    sig_val = row.get("SignatureBase64")
-                                    img = image_from_signature_value(sig_val)
-
-                                    if img is not None:
-                                        img = make_white_background_transparent(img, threshold=245)
-                                        tmp_name = f"tmp_{m_id}_{i}_{random.randint(1000,9999)}.png"
-                                        img.save(tmp_name, format="PNG")
-                                        pdf.image(tmp_name, x+35, y+4, h=17)
-                                        try:
-                                            os.remove(tmp_name)
-                                        except Exception:
-                                            pass
-
-                                out = pdf.output(dest="S")
-                                pdf_bytes = bytes(out)
+                                pdf_bytes = generate_attendance_pdf(fresh_m.to_dict(), fresh_att_subset.to_dict("records"))
                                 st.session_state.pdf_cache[pdf_key] = pdf_bytes
                                 st.rerun()
 
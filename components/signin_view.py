@@ -1,12 +1,12 @@
 import streamlit as st
-from io import BytesIO
-from PIL import Image
 from streamlit_drawable_canvas import st_canvas
 
 # Remove refresh_attendees_only from imports
 from core.state import refresh_all_data
-from services.data_service import save_signature
-from utils import is_canvas_blank, safe_int, safe_str
+from config import SIGNATURE_ASYNC_COMMIT, SIGNATURE_STORAGE
+from services.data_service import save_signature, save_vector_signature
+from services.journal_service import journal_signature
+from utils import encode_signature_strokes, is_canvas_blank, normalize_signature_image, safe_int, safe_str
 
 def show_signin(mid_param):
     if st.session_state.get("last_save_error"):
@@ -103,13 +103,29 @@ def show_signin(mid_param):
     if st.session_state.processing_sign:
         success = False
         try:
-            img = Image.fromarray(canvas.image_data.astype('uint8'), 'RGBA')
-            buffered = BytesIO()
-            img.save(buffered, format="PNG")
-            png_bytes = buffered.getvalue()
-
-            # 1. Save to Cloud (returns "gas:FILE_ID")
-            sig_val = save_signature(str(mid_param), safe_str(actual_name), png_bytes, retries=10)
+            stroke_payload = ""
+            if SIGNATURE_STORAGE == "vector":
+                stroke_payload = encode_signature_strokes(canvas.json_data)
+
+            png_bytes = b""
+            if not stroke_payload:
+                # Crop + 1-bit palette + PDF height, once here instead of on every export
+                png_bytes = normalize_signature_image(canvas.image_data)
+
+            if SIGNATURE_ASYNC_COMMIT:
+                # 1. Optimistic: journal locally and confirm now; the background worker
+                # uploads and updates the sheet (value stays empty until it commits)
+                if stroke_payload:
+                    journal_signature(str(mid_param), safe_str(actual_name), "vector", stroke_payload.encode("utf-8"))
+                else:
+                    journal_signature(str(mid_param), safe_str(actual_name), "png", png_bytes)
+                sig_val = ""
+            elif stroke_payload:
+                # 1a. Vector mode: stroke paths go straight into the sheet (returns "vec:...")
+                sig_val = save_vector_signature(str(mid_param), safe_str(actual_name), stroke_payload, retries=10)
+            else:
+                # 1b. Save to Cloud (returns "gas:FILE_ID")
+                sig_val = save_signature(str(mid_param), safe_str(actual_name), png_bytes, retries=10)
 
             # 2. ⚡ SPEED FIX: Update Local Session State directly
             # Instead of downloading the whole sheet again (slow), we just update the specific cell in memory.
@@ -26,4 +26,27 @@ GAS_FOLDER_ID = st.secrets.get("gas", {}).get("folder_id", "")
 # Sheet signature value formats:
 # - legacy: data:image/png;base64,...
 # - new:    gas:<fileId>
+# - vector: vec:<w>,<h>,<stroke_width>;<x0>,<y0>,<dx>,<dy>,...;...   (stroke paths inline)
 SIGNATURE_GAS_PREFIX = "gas:"
+SIGNATURE_VEC_PREFIX = "vec:"
+
+# Signature storage mode (Streamlit secrets, optional):
+# [signature]
+# storage = "vector"          # default "raster" = PNG uploaded through the GAS bridge
+# async_commit = true         # confirm at once; a background worker persists from a local journal
+# journal_path = "sign_journal.sqlite3"
+SIGNATURE_STORAGE = st.secrets.get("signature", {}).get("storage", "raster")
+SIGNATURE_ASYNC_COMMIT = bool(st.secrets.get("signature", {}).get("async_commit", False))
+SIGN_JOURNAL_PATH = st.secrets.get("signature", {}).get("journal_path", "sign_journal.sqlite3")
+
+# Signatures are cropped to their strokes and scaled to this height at sign time.
+# The PDF draws them 17 mm tall, so 120 px is roughly 180 dpi.
+SIGNATURE_TARGET_HEIGHT_PX = 120
+
+# Shared sheet snapshot for several app processes on one host (optional, needs pyarrow).
+# One process downloads and publishes; the others memory-map it while it is fresh.
+# [snapshot]
+# dir = ".snapshot"   # "" disables
+# max_age = 60        # seconds
+SNAPSHOT_DIR = st.secrets.get("snapshot", {}).get("dir", ".snapshot")
+SNAPSHOT_MAX_AGE = int(st.secrets.get("snapshot", {}).get("max_age", 60))
@@ -40,3 +40,27 @@ def get_sheet_object(worksheet_name: str):
             else:
                 time.sleep(1)
     return client.open(SHEET_NAME).worksheet(worksheet_name)
+
+@st.cache_resource
+def get_spreadsheet():
+    """Spreadsheet handle opened once per process (avoids a Drive name lookup per call)."""
+    return get_gspread_client().open(SHEET_NAME)
+
+@st.cache_resource
+def get_authorized_session():
+    from google.auth.transport.requests import AuthorizedSession
+    return AuthorizedSession(get_credentials())
+
+def get_sheet_revision() -> str:
+    """
+    Cheap change probe: the Drive version of the spreadsheet, which increases on
+    every edit to any tab. One small Drive API request; no Sheets read quota used.
+    """
+    file_id = get_spreadsheet().id
+    r = get_authorized_session().get(
+        f"https://www.googleapis.com/drive/v3/files/{file_id}",
+        params={"fields": "version", "supportsAllDrives": "true"},
+        timeout=10,
+    )
+    r.raise_for_status()
+    return str(r.json()["version"])
@@ -0,0 +1,150 @@
+"""
+Shared on-disk snapshot of the Google Sheets data.
+
+One process downloads the sheets and publishes them as Arrow IPC (Feather v2) files;
+every other Streamlit process on the host memory-maps them instead of calling the
+Sheets API. A small JSON manifest names the current file per sheet and carries a
+version stamp; it is swapped atomically with os.replace.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+from gspread.utils import numericise
+
+from config import SNAPSHOT_DIR
+
+try:
+    import pyarrow as pa
+except Exception:  # pragma: no cover
+    pa = None
+
+try:
+    import fcntl
+except Exception:  # pragma: no cover (non-POSIX)
+    fcntl = None
+
+MANIFEST = "manifest.json"
+_MIXED_KEY = b"esign.mixed_columns"
+# Superseded files are kept this long so a reader that already read the old manifest can still open them
+_STALE_FILE_GRACE = 120
+
+def snapshot_enabled() -> bool:
+    return bool(SNAPSHOT_DIR) and pa is not None
+
+def _path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, name)
+
+def _read_manifest() -> dict:
+    try:
+        with open(_path(MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {"version": 0, "sheets": {}}
+
+def _write_manifest(manifest: dict):
+    tmp = _path(f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, _path(MANIFEST))
+
+@contextmanager
+def _flock(name: str):
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(_path(name), "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def refresh_lock():
+    """Serialize downloads so only one process refreshes the snapshot at a time."""
+    return _flock("refresh.lock")
+
+def _to_table(df: pd.DataFrame) -> "pa.Table":
+    # get_all_records yields mixed int/str columns (e.g. RankID with blanks) that Arrow
+    # cannot type; store those as text and re-numericise them on attach.
+    df = df.copy()
+    mixed = []
+    for col in df.columns:
+        if df[col].dtype == object:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[col] = df[col].astype(str)
+                mixed.append(col)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[_MIXED_KEY] = json.dumps(mixed).encode("utf-8")
+    return table.replace_schema_metadata(meta)
+
+def _from_table(table: "pa.Table") -> pd.DataFrame:
+    df = table.to_pandas()
+    mixed = json.loads((table.schema.metadata or {}).get(_MIXED_KEY, b"[]"))
+    for col in mixed:
+        df[col] = df[col].map(numericise)
+    return df
+
+def published_version() -> int:
+    """Version stamp of the current manifest (0 if none); one small file read."""
+    return int(_read_manifest().get("version", 0))
+
+def publish_snapshot(frames: Dict[str, pd.DataFrame]) -> int:
+    """Write each sheet to a new file and atomically point the manifest at it. Returns the version."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with _flock("manifest.lock"):
+        manifest = _read_manifest()
+        version = int(manifest.get("version", 0)) + 1
+        now = time.time()
+        for sheet, df in frames.items():
+            fname = f"{sheet}.{version}.arrow"
+            tmp = _path(f"{fname}.{os.getpid()}.tmp")
+            table = _to_table(df)
+            with pa.OSFile(tmp, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, _path(fname))
+            manifest["sheets"][sheet] = {"file": fname, "written_at": now}
+        manifest["version"] = version
+        _write_manifest(manifest)
+        _remove_stale_files(manifest)
+    return version
+
+def _remove_stale_files(manifest: dict):
+    live = {entry["file"] for entry in manifest["sheets"].values()}
+    cutoff = time.time() - _STALE_FILE_GRACE
+    for fname in os.listdir(SNAPSHOT_DIR):
+        if not fname.endswith(".arrow") or fname in live:
+            continue
+        try:
+            if os.path.getmtime(_path(fname)) < cutoff:
+                os.remove(_path(fname))
+        except OSError:
+            pass
+
+def attach_snapshot(sheets: Iterable[str], max_age: float) -> Optional[Tuple[Dict[str, pd.DataFrame], int]]:
+    """
+    Memory-map the published sheets. Returns (frames, version), or None if any sheet
+    is missing or older than max_age seconds.
+    """
+    manifest = _read_manifest()
+    now = time.time()
+    frames = {}
+    try:
+        for sheet in sheets:
+            entry = manifest["sheets"].get(sheet)
+            if not entry or now - entry["written_at"] > max_age:
+                return None
+            # Not closed explicitly: Arrow buffers keep the mapping alive while referenced
+            source = pa.memory_map(_path(entry["file"]), "r")
+            frames[sheet] = _from_table(pa.ipc.open_file(source).read_all())
+    except Exception:
+        return None
+    return frames, int(manifest.get("version", 0))
@@ -1,5 +1,14 @@
+import hashlib
+from typing import Optional
+
+import pandas as pd
 import streamlit as st
-from services.data_service import api_read_with_retry
+from config import SIGNATURE_ASYNC_COMMIT, SNAPSHOT_MAX_AGE
+from core.connection import get_sheet_revision
+from core.snapshot import attach_snapshot, publish_snapshot, published_version, refresh_lock, snapshot_enabled
+from services.data_service import api_read_with_retry, read_attendee_rows, read_meeting_row_index, read_sync_probe
+from services.data_service import write_meeting_status
+from services.employee_index import EmployeeIndex
 
 def init_data():
     if "df_master" not in st.session_state: st.session_state.df_master = None
@@ -12,38 +21,227 @@ def init_data():
     if "is_admin" not in st.session_state: st.session_state.is_admin = False
     if "last_save_error" not in st.session_state: st.session_state.last_save_error = None
     if "success_msg" not in st.session_state: st.session_state.success_msg = None
+    if "snapshot_version" not in st.session_state: st.session_state.snapshot_version = None
+    if "sheet_revision" not in st.session_state: st.session_state.sheet_revision = None
+    if "att_fingerprints" not in st.session_state: st.session_state.att_fingerprints = None
+    if SIGNATURE_ASYNC_COMMIT:
+        # Idempotent; also replays journal entries left pending by a restart
+        from services.journal_service import start_sign_worker
+        start_sign_worker()
+
+def _load_sheets(sheets, force=False):
+    """
+    Return {sheet: DataFrame}. Attaches the shared on-disk snapshot when it is fresh;
+    otherwise one process at a time downloads from the API and publishes for the rest.
+    force=True always downloads (explicit Sync, or after this session wrote data).
+    """
+    if not snapshot_enabled():
+        return {name: api_read_with_retry(name) for name in sheets}
+
+    if not force:
+        attached = attach_snapshot(sheets, SNAPSHOT_MAX_AGE)
+        if attached is not None:
+            frames, st.session_state.snapshot_version = attached
+            return frames
+
+    with refresh_lock():
+        if not force:
+            # Another process may have refreshed while we waited for the lock
+            attached = attach_snapshot(sheets, SNAPSHOT_MAX_AGE)
+            if attached is not None:
+                frames, st.session_state.snapshot_version = attached
+                return frames
+        frames = {name: api_read_with_retry(name) for name in sheets}
+        # An empty frame means the read failed; never publish it over good data
+        good = {name: df for name, df in frames.items() if not df.empty}
+        if good:
+            try:
+                st.session_state.snapshot_version = publish_snapshot(good)
+            except Exception:
+                pass
+    return frames
 
-def refresh_all_data():
+def refresh_all_data(force=True):
     """Admin needs everything."""
     with st.spinner("🔄 Syncing All Databases..."):
-        st.session_state.df_master = api_read_with_retry("Employee_Master")
-        st.session_state.df_info = api_read_with_retry("Meeting_Info")
-        st.session_state.df_att = api_read_with_retry("Meeting_Attendees")
+        frames = _load_sheets(["Employee_Master", "Meeting_Info", "Meeting_Attendees"], force=force)
+        st.session_state.df_master = frames["Employee_Master"]
+        st.session_state.df_info = frames["Meeting_Info"]
+        st.session_state.df_att = frames["Meeting_Attendees"]
         st.session_state.pdf_cache = {}
+        # Unknown baseline: the next sync_changes() diffs against these frames
+        st.session_state.sheet_revision = None
+        st.session_state.att_fingerprints = None
 
-def refresh_signin_data():
+def refresh_signin_data(force=True):
     """Sign-in View ONLY needs Meeting Info and Attendees. Skips Master (Fast)."""
     with st.spinner("🔄 Loading Meeting Data..."):
         # We DO NOT load Employee_Master here to save time
-        st.session_state.df_info = api_read_with_retry("Meeting_Info")
-        st.session_state.df_att = api_read_with_retry("Meeting_Attendees")
+        frames = _load_sheets(["Meeting_Info", "Meeting_Attendees"], force=force)
+        st.session_state.df_info = frames["Meeting_Info"]
+        st.session_state.df_att = frames["Meeting_Attendees"]
         st.session_state.pdf_cache = {}
 
 def refresh_attendees_only():
     """Fastest refresh: updates status after signing."""
-    st.session_state.df_att = api_read_with_retry("Meeting_Attendees")
+    st.session_state.df_att = _load_sheets(["Meeting_Attendees"], force=True)["Meeting_Attendees"]
     st.session_state.pdf_cache = {}
 
+def _newer_snapshot() -> Optional[int]:
+    """The published version if another process has published since this session loaded, else None."""
+    if not snapshot_enabled() or st.session_state.snapshot_version is None:
+        return None
+    latest = published_version()
+    return latest if latest > st.session_state.snapshot_version else None
+
 def ensure_data_loaded():
     """For Admin: Needs everything."""
     if (st.session_state.df_info is None or 
         st.session_state.df_att is None or 
         st.session_state.df_master is None or
         st.session_state.df_master.empty):
-        refresh_all_data()
+        # Attach to the shared snapshot instead of downloading when it is fresh
+        refresh_all_data(force=False)
+    elif (latest := _newer_snapshot()) is not None:
+        refresh_all_data(force=False)
+        # Even if that reload failed, wait for the next publish instead of retrying every rerun
+        st.session_state.snapshot_version = max(st.session_state.snapshot_version, latest)
 
 def ensure_signin_data_loaded():
     """For Attendees: Needs Info + Attendees only."""
     if (st.session_state.df_info is None or 
         st.session_state.df_att is None):
-        refresh_signin_data()
+        refresh_signin_data(force=False)
+    elif (latest := _newer_snapshot()) is not None:
+        refresh_signin_data(force=False)
+        st.session_state.snapshot_version = max(st.session_state.snapshot_version, latest)
+
+def get_employee_index() -> EmployeeIndex:
+    """Employee lookup index for the current df_master; rebuilt only when a new snapshot is loaded."""
+    df_master = st.session_state.df_master
+    if st.session_state.get("emp_index_src") is not df_master:
+        st.session_state.emp_index = EmployeeIndex(df_master)
+        st.session_state.emp_index_src = df_master
+    return st.session_state.emp_index
+
+def _fingerprint(pairs) -> str:
+    return hashlib.md5("\x1e".join(f"{n}\x1f{s}" for n, s in pairs).encode("utf-8")).hexdigest()
+
+def _fingerprints_from_keys(keys) -> dict:
+    """MeetingID -> fingerprint of its (AttendeeName, Status) rows, in sheet order."""
+    per_meeting = {}
+    for _, mid, name, status in keys:
+        if mid:
+            per_meeting.setdefault(mid, []).append((name, status))
+    return {mid: _fingerprint(pairs) for mid, pairs in per_meeting.items()}
+
+def _fingerprints_from_frame(df_att: pd.DataFrame) -> dict:
+    per_meeting = {}
+    for mid, name, status in zip(df_att["MeetingID"].astype(str).str.strip(),
+                                 df_att["AttendeeName"].astype(str).str.strip(),
+                                 df_att["Status"].astype(str).str.strip()):
+        if mid:
+            per_meeting.setdefault(mid, []).append((name, status))
+    return {mid: _fingerprint(pairs) for mid, pairs in per_meeting.items()}
+
+def sync_changes(include_master=False, force_meetings=()) -> bool:
+    """
+    Incremental admin refresh. Returns True if local data changed.
+    1. Drive version probe (tiny request): unchanged -> nothing else is read.
+    2. One Sheets request: Meeting_Info (and Employee_Master if asked) plus the
+       MeetingID/AttendeeName/Status columns of Meeting_Attendees.
+    3. Full attendee rows are fetched only for meetings whose (name, status)
+       fingerprint changed, plus force_meetings (e.g. before a PDF, to also catch
+       a re-signed signature whose status did not change).
+    Falls back to refresh_all_data() when there is no usable baseline.
+    """
+    df_att = st.session_state.df_att
+    if st.session_state.df_info is None or df_att is None or df_att.empty:
+        refresh_all_data()
+        return True
+
+    try:
+        revision = get_sheet_revision()
+    except Exception:
+        revision = None
+    if revision is not None and revision == st.session_state.sheet_revision and not force_meetings:
+        return False
+
+    headers = df_att.columns.tolist()
+    full_sheets = ("Meeting_Info", "Employee_Master") if include_master else ("Meeting_Info",)
+    try:
+        frames, keys = read_sync_probe(headers, full_sheets)
+    except Exception:
+        # e.g. a renamed column: the incremental path cannot be trusted
+        refresh_all_data()
+        return True
+
+    new_fp = _fingerprints_from_keys(keys)
+    old_fp = st.session_state.att_fingerprints or _fingerprints_from_frame(df_att)
+    changed = {mid for mid in set(new_fp) | set(old_fp) if new_fp.get(mid) != old_fp.get(mid)}
+    changed |= {str(m) for m in force_meetings}
+
+    if changed:
+        fresh = read_attendee_rows(headers, [row for row, mid, _, _ in keys if mid in changed])
+        kept = df_att[~df_att["MeetingID"].astype(str).str.strip().isin(changed)]
+        st.session_state.df_att = pd.concat([kept, fresh], ignore_index=True)
+        for mid in changed:
+            st.session_state.pdf_cache.pop(f"pdf_{mid}", None)
+
+    info_changed = False
+    df_info_new = frames["Meeting_Info"]
+    if not df_info_new.empty and not df_info_new.equals(st.session_state.df_info):
+        st.session_state.df_info = df_info_new
+        st.session_state.pdf_cache = {}
+        info_changed = True
+
+    master_changed = False
+    if include_master:
+        df_master_new = frames["Employee_Master"]
+        if not df_master_new.empty and not df_master_new.equals(st.session_state.df_master):
+            st.session_state.df_master = df_master_new
+            master_changed = True
+
+    st.session_state.att_fingerprints = new_fp
+    st.session_state.sheet_revision = revision
+
+    if (changed or info_changed or master_changed) and snapshot_enabled():
+        publish = {"Meeting_Info": st.session_state.df_info, "Meeting_Attendees": st.session_state.df_att}
+        if master_changed:
+            publish["Employee_Master"] = st.session_state.df_master
+        try:
+            st.session_state.snapshot_version = publish_snapshot(publish)
+        except Exception:
+            pass
+    return bool(changed or info_changed or master_changed)
+
+def set_meetings_status(meeting_ids, new_status):
+    """
+    Open/Close many meetings with one verify read and one batched write, using the
+    cached MeetingID -> row index (rebuilt once if rows moved), then patch df_info
+    in place instead of resyncing. Returns (written_ids, missing_ids).
+    """
+    df_info = st.session_state.df_info
+    headers = df_info.columns.tolist()
+    ids = [str(m).strip() for m in dict.fromkeys(meeting_ids)]
+
+    index = st.session_state.get("info_row_index")
+    if index is None:
+        index = read_meeting_row_index(headers)
+    missing = write_meeting_status(ids, new_status, headers, index)
+    if missing:
+        # New or moved rows since the index was built: rebuild it and retry just those
+        index = read_meeting_row_index(headers)
+        missing = write_meeting_status(missing, new_status, headers, index)
+    st.session_state.info_row_index = index
+
+    written = [m for m in ids if m not in missing]
+    if written:
+        mask = df_info["MeetingID"].astype(str).str.strip().isin(written)
+        st.session_state.df_info.loc[mask, "MeetingStatus"] = new_status
+        if snapshot_enabled():
+            try:
+                st.session_state.snapshot_version = publish_snapshot({"Meeting_Info": st.session_state.df_info})
+            except Exception:
+                pass
+    return written, missing
@@ -1,14 +1,18 @@
 import time
 from typing import Tuple
 import base64
+import hashlib
 
 import gspread
 import pandas as pd
 import requests
 
-from core.connection import get_sheet_object
-from config import GAS_UPLOAD_URL, GAS_API_KEY, GAS_FOLDER_ID, SIGNATURE_GAS_PREFIX
-from utils import safe_str
+from core.connection import get_sheet_object, get_spreadsheet
+from config import GAS_UPLOAD_URL, GAS_API_KEY, GAS_FOLDER_ID, SIGNATURE_GAS_PREFIX, SIGNATURE_VEC_PREFIX
+from utils import gas_protocol_hint, remember_gas_protocol, safe_str
+
+# Protocol 2 upload chunk size (base64 chars); the bridge caches each chunk (limit 100 KB)
+GAS_CHUNK_CHARS = 90000
 
 def api_read_with_retry(worksheet_name):
     try:
@@ -29,6 +33,123 @@ def api_read_with_retry(worksheet_name):
         pass
     return pd.DataFrame()
 
+def _records_frame(headers, rows) -> pd.DataFrame:
+    """Build a DataFrame the way get_all_records does: padded rows, numericised values."""
+    width = len(headers)
+    data = [gspread.utils.numericise_all((list(r) + [""] * width)[:width]) for r in rows]
+    return pd.DataFrame(data, columns=headers)
+
+def _column_letter(col: int) -> str:
+    return "".join(ch for ch in gspread.utils.rowcol_to_a1(1, col) if ch.isalpha())
+
+def batch_read_values(ranges, retries: int = 3) -> list:
+    """Read several A1 ranges in ONE Sheets API request. Returns a list of 2D value lists."""
+    for i in range(retries):
+        try:
+            resp = get_spreadsheet().values_batch_get(ranges)
+            return [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+        except gspread.exceptions.APIError as e:
+            if i == retries - 1:
+                raise
+            time.sleep((i + 1) * 2 if "429" in str(e) else 1)
+    return []
+
+def read_sync_probe(att_headers, full_sheets=("Meeting_Info",)):
+    """
+    ONE Sheets request returning:
+    - {sheet: DataFrame} for each small sheet in full_sheets, read whole
+    - [(sheet_row, MeetingID, AttendeeName, Status)] for Meeting_Attendees, from those
+      three columns only (not the possibly large signature column)
+    """
+    cols = [att_headers.index(h) + 1 for h in ("MeetingID", "AttendeeName", "Status")]
+    ranges = list(full_sheets) + [f"Meeting_Attendees!{_column_letter(c)}2:{_column_letter(c)}" for c in cols]
+    blocks = batch_read_values(ranges)
+
+    frames = {}
+    for name, values in zip(full_sheets, blocks):
+        frames[name] = _records_frame(values[0], values[1:]) if values else pd.DataFrame()
+
+    mids, names, statuses = blocks[len(full_sheets):]
+
+    def cell(col, i):
+        return safe_str(col[i][0]) if i < len(col) and col[i] else ""
+
+    n = max(len(mids), len(names), len(statuses))
+    keys = [(i + 2, cell(mids, i), cell(names, i), cell(statuses, i)) for i in range(n)]
+    return frames, keys
+
+def read_attendee_rows(att_headers, sheet_rows) -> pd.DataFrame:
+    """Fetch full Meeting_Attendees rows by sheet row number, contiguous runs batched in one request."""
+    if not sheet_rows:
+        return pd.DataFrame(columns=att_headers)
+    last_col = _column_letter(len(att_headers))
+    runs, start, prev = [], None, None
+    for r in sorted(set(sheet_rows)):
+        if start is None:
+            start = prev = r
+        elif r == prev + 1:
+            prev = r
+        else:
+            runs.append((start, prev))
+            start = prev = r
+    runs.append((start, prev))
+
+    blocks = batch_read_values([f"Meeting_Attendees!A{a}:{last_col}{b}" for a, b in runs])
+    rows = []
+    for (a, b), block in zip(runs, blocks):
+        # The API drops trailing empty rows; keep positions aligned
+        rows.extend((block + [[]] * (b - a + 1))[:b - a + 1])
+    return _records_frame(att_headers, rows)
+
+def read_meeting_row_index(info_headers) -> dict:
+    """MeetingID -> sheet row for Meeting_Info, from its MeetingID column only (one small read)."""
+    col = _column_letter(info_headers.index("MeetingID") + 1)
+    (values,) = batch_read_values([f"Meeting_Info!{col}2:{col}"])
+    index = {}
+    for i, r in enumerate(values):
+        mid = safe_str(r[0]) if r else ""
+        if mid and mid not in index:
+            index[mid] = i + 2
+    return index
+
+def write_meeting_status(meeting_ids, new_status: str, info_headers, row_index: dict, retries: int = 3) -> list:
+    """
+    Set MeetingStatus for many meetings in ONE batched write. Target rows come from
+    row_index and are first checked (one read) to still hold their MeetingID.
+    Returns the IDs that were NOT written (missing or moved); rebuild the index for those.
+    """
+    id_col = _column_letter(info_headers.index("MeetingID") + 1)
+    status_col = _column_letter(info_headers.index("MeetingStatus") + 1)
+
+    targets = [(mid, row_index[mid]) for mid in meeting_ids if mid in row_index]
+    skipped = [mid for mid in meeting_ids if mid not in row_index]
+    if not targets:
+        return skipped
+
+    cells = batch_read_values([f"Meeting_Info!{id_col}{row}" for _, row in targets])
+    verified = []
+    for (mid, row), cell in zip(targets, cells):
+        if cell and cell[0] and safe_str(cell[0][0]) == mid:
+            verified.append((mid, row))
+        else:
+            skipped.append(mid)
+    if not verified:
+        return skipped
+
+    body = {
+        "valueInputOption": "USER_ENTERED",
+        "data": [{"range": f"Meeting_Info!{status_col}{row}", "values": [[new_status]]} for _, row in verified],
+    }
+    for i in range(retries):
+        try:
+            get_spreadsheet().values_batch_update(body)
+            break
+        except gspread.exceptions.APIError as e:
+            if i == retries - 1:
+                raise
+            time.sleep(2 if "429" in str(e) else 1)
+    return skipped
+
 def _find_attendee_row(ws, attendee_name: str, meeting_id: str) -> Tuple[int, int, int]:
     all_rows = ws.get_all_values()
     headers = all_rows[0]
@@ -46,18 +167,88 @@ def _find_attendee_row(ws, attendee_name: str, meeting_id: str) -> Tuple[int, in
             break
     return row_update_idx, status_col, sig_col
 
+def signature_upload_key(png_bytes: bytes, meeting_id: str, attendee_name: str) -> str:
+    """Idempotency key: content hash + (meeting, attendee). Same signature -> same Drive file."""
+    content_hash = hashlib.sha256(png_bytes).hexdigest()
+    return hashlib.sha256(f"{meeting_id}\x1f{safe_str(attendee_name)}\x1f{content_hash}".encode("utf-8")).hexdigest()
+
+class _LegacyGasBridge(RuntimeError):
+    """The bridge answered a protocol 2 request like a protocol 1 deployment."""
+
+def _gas_post_v2(params: dict, body: str = "") -> dict:
+    r = requests.post(
+        GAS_UPLOAD_URL,
+        params={"api_key": GAS_API_KEY, **params},
+        data=body.encode("utf-8"),
+        headers={"Content-Type": "text/plain"},
+        timeout=30,
+    )
+    r.raise_for_status()
+    js = r.json()
+    if "protocol" not in js:
+        raise _LegacyGasBridge(js.get("error", "GAS bridge does not speak protocol 2"))
+    remember_gas_protocol(js["protocol"])
+    if not js.get("ok"):
+        raise RuntimeError(js.get("error", "GAS request failed"))
+    return js
+
+def _upload_chunked(data_b64: str, upload_id: str, filename: str) -> str:
+    """
+    Protocol 2 upload: raw base64 text bodies in GAS_CHUNK_CHARS pieces.
+    A retry first asks the bridge which chunks (or which finished file) it already has.
+    """
+    chunks = [data_b64[i:i + GAS_CHUNK_CHARS] for i in range(0, len(data_b64), GAS_CHUNK_CHARS)]
+    base = {"uploadId": upload_id, "total": len(chunks), "folderId": GAS_FOLDER_ID,
+            "filename": filename, "mimeType": "image/png"}
+
+    for attempt in range(3):
+        try:
+            received = set()
+            if attempt > 0:
+                status = _gas_post_v2({"action": "upload_status", **base})
+                if status.get("fileId"):
+                    return status["fileId"]
+                received = set(status.get("received", []))
+                # Everything arrived but no file yet: resend the last chunk to trigger assembly
+                received.discard(len(chunks) - 1)
+            for i, chunk in enumerate(chunks):
+                if i in received:
+                    continue
+                js = _gas_post_v2({"action": "upload_chunk", "index": i, **base}, chunk)
+                if js.get("fileId"):
+                    return js["fileId"]
+            raise RuntimeError("GAS upload incomplete")
+        except _LegacyGasBridge:
+            raise
+        except Exception:
+            if attempt == 2:
+                raise
+            time.sleep(1 + attempt)
+
 def upload_signature_png_to_gas(png_bytes: bytes, meeting_id: str, attendee_name: str) -> str:
     if not GAS_UPLOAD_URL or not GAS_API_KEY or not GAS_FOLDER_ID:
         raise RuntimeError("GAS bridge not configured. Set secrets: [gas].upload_url, api_key, folder_id")
 
+    key = signature_upload_key(png_bytes, meeting_id, attendee_name)
     data_b64 = base64.b64encode(png_bytes).decode("utf-8")
+    # Deterministic per key: a retried upload finds the file instead of duplicating it
+    filename = f"signature_mid{meeting_id}_{safe_str(attendee_name).replace(' ','_')}_{key[:16]}.png"
+
+    if gas_protocol_hint() >= 2:
+        try:
+            return _upload_chunked(data_b64, key, filename)
+        except _LegacyGasBridge:
+            # Older deployment: nothing was stored, fall through to the JSON upload
+            remember_gas_protocol(1)
+
     payload = {
         "action": "upload",
         "api_key": GAS_API_KEY,
         "folderId": GAS_FOLDER_ID,
-        "filename": f"signature_mid{meeting_id}_{safe_str(attendee_name).replace(' ','_')}.png",
+        "filename": filename,
         "mimeType": "image/png",
         "data_base64": data_b64,
+        "uploadKey": key,
     }
 
     for i in range(3):
@@ -76,13 +267,10 @@ def upload_signature_png_to_gas(png_bytes: bytes, meeting_id: str, attendee_name
                 raise
             time.sleep(1 + i)
 
-# ⚡ CHANGE: Return 'str' instead of 'None'
-def save_signature(mid_param: str, attendee_name: str, png_bytes: bytes, retries: int = 10) -> str:
+def write_signature_value(mid_param: str, attendee_name: str, sig_value: str, retries: int = 10) -> str:
+    """Mark the attendee Signed and store sig_value (gas:<fileId> or vec:<strokes>)."""
     ws_attendees = get_sheet_object("Meeting_Attendees")
 
-    file_id = upload_signature_png_to_gas(png_bytes, meeting_id=str(mid_param), attendee_name=attendee_name)
-    sig_value = f"{SIGNATURE_GAS_PREFIX}{file_id}"
-
     row_update_idx, status_col, sig_col = _find_attendee_row(ws_attendees, attendee_name, str(mid_param))
     if row_update_idx <= 0:
         raise ValueError("Record not found on server.")
@@ -100,3 +288,49 @@ def save_signature(mid_param: str, attendee_name: str, png_bytes: bytes, retries
                 raise
             time.sleep(2 + i)
     return sig_value
+
+# ⚡ CHANGE: Return 'str' instead of 'None'
+def save_signature(mid_param: str, attendee_name: str, png_bytes: bytes, retries: int = 10) -> str:
+    file_id = upload_signature_png_to_gas(png_bytes, meeting_id=str(mid_param), attendee_name=attendee_name)
+    sig_value = f"{SIGNATURE_GAS_PREFIX}{file_id}"
+    return write_signature_value(mid_param, attendee_name, sig_value, retries=retries)
+
+def save_vector_signature(mid_param: str, attendee_name: str, stroke_payload: str, retries: int = 10) -> str:
+    """Store encoded stroke paths inline in the sheet; no GAS round trip."""
+    sig_value = f"{SIGNATURE_VEC_PREFIX}{stroke_payload}"
+    return write_signature_value(mid_param, attendee_name, sig_value, retries=retries)
+
+def sweep_orphan_signatures(dry_run: bool = True, grace_hours: int = 24) -> dict:
+    """
+    Trash Drive signature files that no Meeting_Attendees row references.
+    Files younger than grace_hours are kept (uploads whose sheet write is still pending).
+    Returns the GAS summary: {"scanned", "orphans", "trashed"}.
+    """
+    if not GAS_UPLOAD_URL or not GAS_API_KEY or not GAS_FOLDER_ID:
+        raise RuntimeError("GAS bridge not configured. Set secrets: [gas].upload_url, api_key, folder_id")
+
+    # Read the sheet fresh: a stale copy would make new signatures look orphaned
+    ws_attendees = get_sheet_object("Meeting_Attendees")
+    all_rows = ws_attendees.get_all_values()
+    if not all_rows:
+        raise RuntimeError("Meeting_Attendees is empty; refusing to sweep.")
+    sig_idx = all_rows[0].index("SignatureBase64")
+    referenced = []
+    for r in all_rows[1:]:
+        val = safe_str(r[sig_idx]) if sig_idx < len(r) else ""
+        if val.startswith(SIGNATURE_GAS_PREFIX):
+            referenced.append(val[len(SIGNATURE_GAS_PREFIX):].strip())
+
+    r = requests.post(GAS_UPLOAD_URL, json={
+        "action": "sweep",
+        "api_key": GAS_API_KEY,
+        "folderId": GAS_FOLDER_ID,
+        "referencedIds": referenced,
+        "graceHours": grace_hours,
+        "dryRun": dry_run,
+    }, timeout=120)
+    r.raise_for_status()
+    js = r.json()
+    if not js.get("ok"):
+        raise RuntimeError(js.get("error", "GAS sweep failed"))
+    return js
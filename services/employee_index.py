@@ -0,0 +1,68 @@
+import heapq
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from utils import safe_int
+
+def _grams(text: str) -> Set[str]:
+    """Single characters and bigrams; CJK names are short, so bigrams narrow well."""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+class EmployeeIndex:
+    """
+    Lookup structures over Employee_Master, built once per loaded snapshot so the
+    Arrange Meeting form does no DataFrame work on reruns.
+    - names: every FullName in RankID order
+    - by_department: Department -> member names in RankID order
+    - records: FullName -> master row (first occurrence, as before)
+    - search(): case-insensitive substring match on names via an n-gram index
+    """
+
+    def __init__(self, df_master: pd.DataFrame):
+        self.records: Dict[str, dict] = {}
+        for rec in df_master.to_dict("records"):
+            self.records.setdefault(str(rec.get("FullName", "")), rec)
+        self.records.pop("", None)
+
+        self.rank: Dict[str, int] = {n: safe_int(r.get("RankID"), 999) for n, r in self.records.items()}
+        # sorted() is stable, so equal ranks keep sheet order (like the old sort_values)
+        self.names: List[str] = sorted(self.records, key=self.rank.__getitem__)
+        self._order: Dict[str, int] = {n: i for i, n in enumerate(self.names)}
+
+        self.by_department: Dict[str, List[str]] = {}
+        if "Department" in df_master.columns:
+            for n in self.names:
+                self.by_department.setdefault(str(self.records[n].get("Department")), []).append(n)
+        self.departments: List[str] = sorted(self.by_department)
+
+        self._lower: List[str] = [n.lower() for n in self.names]
+        # n-gram -> positions in names (so position order is rank order)
+        self._gram_index: Dict[str, Set[int]] = {}
+        for i, low in enumerate(self._lower):
+            for g in _grams(low):
+                self._gram_index.setdefault(g, set()).add(i)
+
+    def members(self, departments: Iterable[str]) -> List[str]:
+        """Members of all given departments, merged in rank order."""
+        buckets = [self.by_department.get(d, []) for d in departments]
+        return list(heapq.merge(*buckets, key=self._order.__getitem__))
+
+    def search(self, query: str, pool: Optional[List[str]] = None) -> List[str]:
+        """Names containing query: prefix hits first, then the rest, each in rank order."""
+        q = query.strip().lower()
+        if not q:
+            return list(pool) if pool is not None else list(self.names)
+
+        # Names holding every bigram of q (every character for a 1-char query);
+        # the substring check then drops those with the grams in another order.
+        grams = {q[i:i + 2] for i in range(len(q) - 1)} or {q}
+        candidates = set.intersection(*(self._gram_index.get(g, set()) for g in grams))
+        hits = [i for i in sorted(candidates) if q in self._lower[i]]
+
+        if pool is not None:
+            allowed = set(pool)
+            hits = [i for i in hits if self.names[i] in allowed]
+        prefix = [self.names[i] for i in hits if self._lower[i].startswith(q)]
+        rest = [self.names[i] for i in hits if not self._lower[i].startswith(q)]
+        return prefix + rest
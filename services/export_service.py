@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from io import BytesIO
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from config import DEPLOYMENT_URL
+from services.pdf_service import generate_attendance_pdf, generate_qr_card
+from utils import export_filename, gas_download_file_bytes, parse_signature_value
+
+PREFETCH_THREADS = 8
+
+def select_meetings(df_info: pd.DataFrame, date_from=None, date_to=None, ids: Optional[List[str]] = None) -> pd.DataFrame:
+    """Meetings within [date_from, date_to] (either end optional) and/or with one of the given IDs."""
+    results = df_info.copy()
+    results["d_obj"] = pd.to_datetime(results["MeetingDate"].astype(str).str.strip(), errors='coerce').dt.date
+    if date_from: results = results[results["d_obj"] >= date_from]
+    if date_to: results = results[results["d_obj"] <= date_to]
+    if ids: results = results[results["MeetingID"].astype(str).isin([str(i) for i in ids])]
+    return results.drop_duplicates(subset=['MeetingID']).drop(columns=["d_obj"])
+
+def prefetch_signatures(sig_values: List[str]) -> Dict[str, bytes]:
+    """Download every gas: signature once, in parallel (I/O bound, so threads)."""
+    file_ids = {}
+    for val in set(sig_values):
+        kind, payload = parse_signature_value(val)
+        if kind == "gas":
+            file_ids[val] = payload
+
+    out = {}
+    with ThreadPoolExecutor(max_workers=PREFETCH_THREADS) as pool:
+        futures = {pool.submit(gas_download_file_bytes, fid): val for val, fid in file_ids.items()}
+        for fut in as_completed(futures):
+            data = fut.result()
+            if data:
+                out[futures[fut]] = data
+    return out
+
+def _render_meeting(meeting: dict, attendees: list, prefetched: Dict[str, bytes]):
+    """
+    Process-pool worker: returns [(zip path, bytes)] for one meeting's PDF and QR card.
+    Runs in a freshly spawned interpreter, so it may only rely on module-level imports.
+    """
+    m_id = str(meeting.get("MeetingID"))
+    url = f"https://{DEPLOYMENT_URL}/?mid={m_id}"
+    pdf_bytes = generate_attendance_pdf(meeting, attendees, prefetched)
+    qr_bytes = generate_qr_card(url, str(meeting.get("MeetingName")), str(meeting.get("Location")), str(meeting.get("TimeRange")))
+    return [
+        (f"pdf/{export_filename(meeting.get('MeetingDate'), meeting.get('MeetingName'), m_id, 'pdf')}", pdf_bytes),
+        (f"qr/{export_filename(meeting.get('MeetingDate'), meeting.get('MeetingName'), m_id, 'png')}", qr_bytes),
+    ]
+
+def bulk_export_zip(meetings: pd.DataFrame, df_att: pd.DataFrame,
+                    progress: Optional[Callable[[int, int, str], None]] = None) -> bytes:
+    """
+    Render attendance PDFs and QR cards for all given meetings on a process pool
+    and write them into one ZIP as each finishes. progress(done, total, label) is
+    called after every meeting.
+    """
+    meeting_records = meetings.to_dict("records")
+    att_by_meeting = {str(k): g.to_dict("records") for k, g in df_att.groupby(df_att["MeetingID"].astype(str))}
+
+    if progress: progress(0, len(meeting_records), "Downloading signatures...")
+    prefetched = prefetch_signatures([
+        r.get("SignatureBase64") for m in meeting_records for r in att_by_meeting.get(str(m.get("MeetingID")), [])
+    ])
+
+    buf = BytesIO()
+    done = 0
+    workers = max(1, min(4, os.cpu_count() or 1, len(meeting_records)))
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        # spawn, not fork: the Streamlit server is multi-threaded, and a forked child can
+        # inherit locks held by other threads (and their sockets) mid-operation
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {}
+            for m in meeting_records:
+                rows = att_by_meeting.get(str(m.get("MeetingID")), [])
+                # Ship each worker only the signatures its meeting needs
+                sigs = {r.get("SignatureBase64"): prefetched[r.get("SignatureBase64")]
+                        for r in rows if r.get("SignatureBase64") in prefetched}
+                futures[pool.submit(_render_meeting, m, rows, sigs)] = m
+            for fut in as_completed(futures):
+                for path, data in fut.result():
+                    zf.writestr(path, data)
+                done += 1
+                if progress: progress(done, len(meeting_records), str(futures[fut].get("MeetingName")))
+    return buf.getvalue()
@@ -0,0 +1,229 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from config import SIGN_JOURNAL_PATH
+from services.data_service import save_signature, save_vector_signature
+from utils import safe_str
+
+# Entry lifecycle: pending -> inflight -> committed, or back to pending with backoff;
+# failed once MAX_ATTEMPTS is reached (an admin can requeue it).
+STATE_PENDING = "pending"
+STATE_INFLIGHT = "inflight"
+STATE_COMMITTED = "committed"
+STATE_FAILED = "failed"
+
+MAX_ATTEMPTS = 10
+INFLIGHT_TIMEOUT = 300  # seconds without a heartbeat before a claim (crash/restart) is replayed
+HEARTBEAT_INTERVAL = 60
+WORKER_IDLE_WAIT = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sign_journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    meeting_id TEXT NOT NULL,
+    attendee_name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    state TEXT NOT NULL,
+    sig_value TEXT NOT NULL DEFAULT '',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT NOT NULL DEFAULT '',
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+_worker_lock = threading.Lock()
+_worker_thread: Optional[threading.Thread] = None
+_wake = threading.Event()
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(SIGN_JOURNAL_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_SCHEMA)
+    return conn
+
+def journal_signature(meeting_id: str, attendee_name: str, kind: str, payload: bytes) -> int:
+    """
+    Durably record a signature before it is persisted remotely.
+    kind: "png" (normalized PNG bytes) or "vector" (encoded stroke payload, utf-8).
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO sign_journal (meeting_id, attendee_name, kind, payload, state, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(meeting_id), safe_str(attendee_name), kind, sqlite3.Binary(payload), STATE_PENDING, now, now, now),
+            )
+            entry_id = cur.lastrowid
+    finally:
+        conn.close()
+    _wake.set()
+    return entry_id
+
+def _claim_next_entry() -> Optional[sqlite3.Row]:
+    """
+    Claim the oldest due entry, or None. Entries are claimed one at a time, right
+    before they are committed, and _heartbeat keeps updated_at fresh while the
+    commit runs, so only claims whose worker is gone are replayed.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            # Replay claims left behind by a crashed worker or a restart
+            conn.execute(
+                "UPDATE sign_journal SET state = ?, updated_at = ? WHERE state = ? AND updated_at < ?",
+                (STATE_PENDING, now, STATE_INFLIGHT, now - INFLIGHT_TIMEOUT),
+            )
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM sign_journal WHERE state = ? AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                    (STATE_PENDING, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                cur = conn.execute(
+                    "UPDATE sign_journal SET state = ?, updated_at = ? WHERE id = ? AND state = ?",
+                    (STATE_INFLIGHT, now, row["id"], STATE_PENDING),
+                )
+                if cur.rowcount == 1:
+                    return row
+                # Another process claimed it first; try the next one
+    finally:
+        conn.close()
+
+@contextmanager
+def _heartbeat(entry_id: int):
+    """Refresh the claim's updated_at while the caller works on it."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                conn = _connect()
+                try:
+                    with conn:
+                        conn.execute(
+                            "UPDATE sign_journal SET updated_at = ? WHERE id = ? AND state = ?",
+                            (time.time(), entry_id, STATE_INFLIGHT),
+                        )
+                finally:
+                    conn.close()
+            except Exception:
+                pass
+
+    thread = threading.Thread(target=beat, name=f"sign-journal-heartbeat-{entry_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def _mark_committed(entry_id: int, sig_value: str):
+    conn = _connect()
+    try:
+        with conn:
+            # The sheet now holds the signature; drop the local copy of the payload
+            conn.execute(
+                "UPDATE sign_journal SET state = ?, sig_value = ?, payload = X'', last_error = '', updated_at = ? WHERE id = ?",
+                (STATE_COMMITTED, sig_value, time.time(), entry_id),
+            )
+    finally:
+        conn.close()
+
+def _mark_attempt_failed(entry_id: int, attempts: int, error: str):
+    now = time.time()
+    state = STATE_FAILED if attempts >= MAX_ATTEMPTS else STATE_PENDING
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "UPDATE sign_journal SET state = ?, attempts = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                (state, attempts, error[:500], now + min(2 ** attempts, 120), now, entry_id),
+            )
+    finally:
+        conn.close()
+
+def _commit_entry(row: sqlite3.Row) -> str:
+    payload = bytes(row["payload"])
+    if row["kind"] == "vector":
+        return save_vector_signature(row["meeting_id"], row["attendee_name"], payload.decode("utf-8"), retries=3)
+    return save_signature(row["meeting_id"], row["attendee_name"], payload, retries=3)
+
+def process_due_entries() -> int:
+    """Persist every due journal entry once. Returns the number committed."""
+    committed = 0
+    while True:
+        row = _claim_next_entry()
+        if row is None:
+            return committed
+        try:
+            with _heartbeat(row["id"]):
+                sig_value = _commit_entry(row)
+            _mark_committed(row["id"], sig_value)
+            committed += 1
+        except Exception as e:
+            _mark_attempt_failed(row["id"], row["attempts"] + 1, str(e))
+
+def _worker_loop():
+    while True:
+        try:
+            process_due_entries()
+        except Exception:
+            # Journal unreadable (disk, lock timeout): try again on the next tick
+            pass
+        _wake.wait(timeout=WORKER_IDLE_WAIT)
+        _wake.clear()
+
+def start_sign_worker():
+    """Start the per-process background committer once; pending entries replay on start."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=_worker_loop, name="sign-journal-worker", daemon=True)
+        _worker_thread.start()
+
+def journal_states(meeting_id: Optional[str] = None) -> Dict[Tuple[str, str], dict]:
+    """Latest journal entry per (MeetingID, AttendeeName): state, attempts, last_error."""
+    conn = _connect()
+    try:
+        sql = ("SELECT meeting_id, attendee_name, state, attempts, last_error FROM sign_journal"
+               " WHERE id IN (SELECT MAX(id) FROM sign_journal GROUP BY meeting_id, attendee_name)")
+        params: tuple = ()
+        if meeting_id is not None:
+            sql += " AND meeting_id = ?"
+            params = (str(meeting_id),)
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return {
+        (r["meeting_id"], r["attendee_name"]): {"state": r["state"], "attempts": r["attempts"], "error": r["last_error"]}
+        for r in rows
+    }
+
+def retry_failed(meeting_id: Optional[str] = None) -> int:
+    """Requeue failed entries (optionally for one meeting). Returns how many were requeued."""
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            sql = "UPDATE sign_journal SET state = ?, attempts = 0, next_attempt_at = ?, updated_at = ? WHERE state = ?"
+            params = [STATE_PENDING, now, now, STATE_FAILED]
+            if meeting_id is not None:
+                sql += " AND meeting_id = ?"
+                params.append(str(meeting_id))
+            count = conn.execute(sql, params).rowcount
+    finally:
+        conn.close()
+    _wake.set()
+    return count
@@ -1,9 +1,38 @@
 import qrcode
 import textwrap
+from functools import lru_cache
 from io import BytesIO
+from typing import Dict, Optional
 
+from fpdf import FPDF
 from PIL import Image, ImageDraw, ImageFont
 from config import FONT_CH
+from utils import decode_signature_strokes, image_from_signature_value, is_normalized_signature
+from utils import make_white_background_transparent, parse_signature_value, safe_int
+
+PDF_FONT_FAMILY = "CustomFont"
+# Signature box inside the 110 mm signature cell, drawn from x + 35, y + 4 (mm)
+SIG_MAX_H = 17
+SIG_MAX_W = 70
+
+def _signature_scale(width: float, height: float) -> float:
+    """mm per source unit: SIG_MAX_H tall unless that would overflow SIG_MAX_W."""
+    return min(SIG_MAX_H / max(height, 1), SIG_MAX_W / max(width, 1))
+
+@lru_cache(maxsize=8)
+def _qr_font(size: int):
+    # Parsing the CJK font is the expensive part of a QR card; keep one per size for the process.
+    try:
+        return ImageFont.truetype(FONT_CH, size)
+    except Exception:
+        return ImageFont.load_default()
+
+def _new_pdf() -> FPDF:
+    # Registered per document: fpdf2 subsets the font object in place at output
+    # time, so a parsed font cannot be shared between documents.
+    pdf = FPDF()
+    pdf.add_font(PDF_FONT_FAMILY, '', FONT_CH, uni=True)
+    return pdf
 
 def generate_qr_card(url, m_name, m_loc, m_time):
     # Force string type to prevent "int has no attribute expandtabs" error
@@ -16,12 +45,8 @@ def generate_qr_card(url, m_name, m_loc, m_time):
     W, H = 600, 850
     img = Image.new('RGB', (W, H), 'white')
     draw = ImageDraw.Draw(img)
-    try:
-        font_header = ImageFont.truetype(FONT_CH, 40)
-        font_body = ImageFont.truetype(FONT_CH, 22)
-    except Exception:
-        font_header = ImageFont.load_default()
-        font_body = ImageFont.load_default()
+    font_header = _qr_font(40)
+    font_body = _qr_font(22)
 
     # 1. Meeting Name (Wrapped)
     wrapper = textwrap.TextWrapper(width=14)
@@ -48,3 +73,78 @@ def generate_qr_card(url, m_name, m_loc, m_time):
     buf = BytesIO()
     img.save(buf, format="PNG")
     return buf.getvalue()
+
+def _draw_pdf_header(pdf: FPDF, meeting: dict):
+    pdf.set_font(PDF_FONT_FAMILY, '', 24)
+    pdf.multi_cell(w=0, h=12, txt=f"{meeting.get('MeetingName')}簽到", align="C")
+    pdf.set_x(10)
+    pdf.set_font_size(14)
+
+    t_range = str(meeting.get('TimeRange', ''))
+    display_time = f"時間：{t_range}" if "/" in t_range else f"時間：{str(meeting.get('MeetingDate')).replace('-', '/')} {t_range}"
+    pdf.cell(0, 10, display_time, ln=True, align="C")
+    pdf.cell(0, 10, f"地點：{meeting.get('Location')}", ln=True, align="C")
+    pdf.ln(5)
+
+def _draw_table_header(pdf: FPDF):
+    pdf.set_fill_color(230, 230, 230)
+    pdf.set_font_size(16)
+    pdf.cell(80, 12, "出席人員", 1, 0, 'C', True)
+    pdf.cell(110, 12, "簽名", 1, 1, 'C', True)
+
+def _draw_vector_signature(pdf: FPDF, payload: str, x: float, y: float):
+    try:
+        width, height, stroke_width, strokes = decode_signature_strokes(payload)
+    except Exception:
+        return
+    # Same placement as raster signatures
+    scale = _signature_scale(width, height)
+    left, top = x + 35, y + 4
+    prev_width = pdf.line_width
+    pdf.set_draw_color(0, 0, 0)
+    pdf.set_line_width(max(stroke_width * scale, 0.2))
+    for pts in strokes:
+        if len(pts) == 1:
+            px, py = pts[0]
+            pts = [(px, py), (px + 0.5, py)]
+        pdf.polyline([(left + px * scale, top + py * scale) for px, py in pts])
+    pdf.set_line_width(prev_width)
+
+def _draw_signature(pdf: FPDF, sig_val, x: float, y: float, prefetched: Optional[Dict[str, bytes]] = None):
+    kind, payload = parse_signature_value(sig_val)
+    if kind == "vector":
+        _draw_vector_signature(pdf, payload, x, y)
+        return
+    if prefetched and sig_val in prefetched:
+        img = Image.open(BytesIO(prefetched[sig_val]))
+    else:
+        img = image_from_signature_value(sig_val)
+    if img is None:
+        return
+    if not is_normalized_signature(img):
+        # Legacy full-canvas PNGs: knock out the white pad background
+        img = make_white_background_transparent(img, threshold=245)
+    # Cropped signatures keep their strokes' aspect ratio; a long flat one must not run off the cell
+    scale = _signature_scale(*img.size)
+    pdf.image(img, x + 35, y + 4, w=img.width * scale, h=img.height * scale)
+
+def generate_attendance_pdf(meeting: dict, attendees: list, prefetched: Optional[Dict[str, bytes]] = None) -> bytes:
+    """
+    Render the attendance sheet for one meeting.
+    meeting: a Meeting_Info record. attendees: Meeting_Attendees records.
+    prefetched: optional {SignatureBase64 value: image bytes} already downloaded by the caller.
+    """
+    rows = sorted(attendees, key=lambda r: safe_int(r.get("RankID"), 999))
+
+    pdf = _new_pdf()
+    pdf.add_page()
+    _draw_pdf_header(pdf, meeting)
+    _draw_table_header(pdf)
+
+    for row in rows:
+        pdf.cell(80, 25, str(row.get('AttendeeName')), 1, 0, 'C')
+        x, y = pdf.get_x(), pdf.get_y()
+        pdf.cell(110, 25, "", 1, 1)
+        _draw_signature(pdf, row.get("SignatureBase64"), x, y, prefetched)
+
+    return bytes(pdf.output(dest="S"))
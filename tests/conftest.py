@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def pytest_configure(config):
+    # config.py reads st.secrets at import; point Streamlit at a minimal secrets file
+    from streamlit import config as st_config
+    secrets_dir = tempfile.mkdtemp(prefix="esign-secrets-")
+    secrets = os.path.join(secrets_dir, "secrets.toml")
+    with open(secrets, "w", encoding="utf-8") as f:
+        f.write('[general]\nadmin_password = "test"\n')
+    st_config.set_option("secrets.files", [secrets])
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from services.employee_index import EmployeeIndex
+
+MASTER = pd.DataFrame([
+    {"FullName": "王小明", "Department": "IT", "RankID": 3, "JobTitle": "Engineer"},
+    {"FullName": "陳明華", "Department": "HR", "RankID": 1, "JobTitle": "Manager"},
+    {"FullName": "Anna Lee", "Department": "IT", "RankID": 2, "JobTitle": "Lead"},
+    {"FullName": "Leeann Wu", "Department": "HR", "RankID": ""},
+    {"FullName": "小明王", "Department": "IT", "RankID": 4},
+])
+
+def test_names_and_members_in_rank_order():
+    idx = EmployeeIndex(MASTER)
+    assert idx.names == ["陳明華", "Anna Lee", "王小明", "小明王", "Leeann Wu"]
+    assert idx.members(["HR", "IT"]) == idx.names
+
+def test_search_prefix_hits_first_then_substring():
+    idx = EmployeeIndex(MASTER)
+    assert idx.search("lee") == ["Leeann Wu", "Anna Lee"]
+    assert idx.search("小明") == ["小明王", "王小明"]
+    assert idx.search("明") == ["陳明華", "王小明", "小明王"]
+    # Same characters, wrong order
+    assert idx.search("明小") == []
+    assert idx.search("lee", pool=idx.members(["IT"])) == ["Anna Lee"]
+    assert idx.search("  ") == idx.names
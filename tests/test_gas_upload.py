@@ -0,0 +1,52 @@
+import pytest
+
+from services import data_service
+import utils
+
+class FakeResponse:
+    def __init__(self, js):
+        self._js = js
+    def raise_for_status(self):
+        pass
+    def json(self):
+        return self._js
+
+class FakeBridge:
+    """Answers like a deployed Code.gs of the given protocol version."""
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.calls = []
+    def post(self, url, params=None, json=None, data=None, headers=None, timeout=None):
+        kind = "chunk" if params else "json"
+        self.calls.append(kind)
+        if kind == "json":
+            return FakeResponse({"ok": True, "fileId": "F-json"})
+        if self.protocol < 2:
+            # Protocol 1 doPost runs JSON.parse on the raw base64 body
+            return FakeResponse({"ok": False, "error": "SyntaxError: Unexpected token"})
+        return FakeResponse({"ok": True, "fileId": "F-chunk", "protocol": self.protocol})
+
+@pytest.fixture
+def bridge(monkeypatch):
+    def make(protocol):
+        fake = FakeBridge(protocol)
+        monkeypatch.setattr(data_service.requests, "post", fake.post)
+        monkeypatch.setattr(data_service, "GAS_UPLOAD_URL", "https://gas.invalid/exec")
+        monkeypatch.setattr(data_service, "GAS_API_KEY", "k")
+        monkeypatch.setattr(data_service, "GAS_FOLDER_ID", "folder")
+        monkeypatch.setattr(utils, "_gas_protocol", {"version": 2, "at": 0.0})
+        return fake
+    return make
+
+def test_protocol2_bridge_takes_chunked_upload(bridge):
+    fake = bridge(2)
+    assert data_service.upload_signature_png_to_gas(b"png", "1", "Alice") == "F-chunk"
+    assert fake.calls == ["chunk"]
+
+def test_protocol1_bridge_falls_back_once(bridge):
+    fake = bridge(1)
+    assert data_service.upload_signature_png_to_gas(b"png", "1", "Alice") == "F-json"
+    assert data_service.upload_signature_png_to_gas(b"png2", "1", "Bob") == "F-json"
+    # The legacy reply is not retried, and is remembered for later uploads
+    assert fake.calls == ["chunk", "json", "json"]
+    assert utils.gas_protocol_hint() == 1
@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+@pytest.fixture
+def journal(monkeypatch, tmp_path):
+    from services import journal_service
+    monkeypatch.setattr(journal_service, "SIGN_JOURNAL_PATH", str(tmp_path / "journal.sqlite3"))
+    return journal_service
+
+def test_entries_commit_in_order(journal, monkeypatch):
+    saved = []
+    monkeypatch.setattr(journal, "save_signature", lambda mid, name, png, retries: saved.append(name) or f"gas:{name}")
+    for name in ("A", "B", "C"):
+        journal.journal_signature("M1", name, "png", b"png")
+
+    assert journal.process_due_entries() == 3
+    assert saved == ["A", "B", "C"]
+    assert {e["state"] for e in journal.journal_states("M1").values()} == {journal.STATE_COMMITTED}
+
+def test_slow_commit_is_not_reclaimed(journal, monkeypatch):
+    # A commit outlasting INFLIGHT_TIMEOUT keeps its claim while the heartbeat runs
+    monkeypatch.setattr(journal, "INFLIGHT_TIMEOUT", 0.3)
+    monkeypatch.setattr(journal, "HEARTBEAT_INTERVAL", 0.05)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_save(mid, name, png, retries):
+        calls.append(name)
+        started.set()
+        release.wait(5)
+        return "gas:x"
+
+    monkeypatch.setattr(journal, "save_signature", slow_save)
+    journal.journal_signature("M1", "A", "png", b"png")
+
+    worker = threading.Thread(target=journal.process_due_entries)
+    worker.start()
+    assert started.wait(5)
+    time.sleep(0.6)
+    # A second worker finds nothing to claim
+    assert journal._claim_next_entry() is None
+    release.set()
+    worker.join(5)
+    assert calls == ["A"]
+    assert journal.journal_states("M1")[("M1", "A")]["state"] == journal.STATE_COMMITTED
@@ -0,0 +1,52 @@
+import os
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("fpdf")
+
+from fpdf import FPDF
+from PIL import Image
+
+from conftest import ROOT
+
+MEETING = {"MeetingName": "Board Review", "MeetingDate": "2026-01-05", "TimeRange": "09:00-10:00", "Location": "Room A"}
+
+def _png(img) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+@pytest.fixture
+def pdf_service(monkeypatch):
+    from services import pdf_service
+    font = os.path.join(ROOT, pdf_service.FONT_CH)
+    if not os.path.exists(font):
+        # The CJK font is a deployment asset; any TTF exercises the same code path
+        font = os.path.join(ROOT, "font_EN.ttf")
+    monkeypatch.setattr(pdf_service, "FONT_CH", font)
+    return pdf_service
+
+def test_consecutive_pdfs_with_different_text(pdf_service):
+    first = pdf_service.generate_attendance_pdf(MEETING, [{"AttendeeName": "Alice", "RankID": 1}])
+    # Glyphs absent from the first document must still be embedded in the second
+    second = pdf_service.generate_attendance_pdf(
+        dict(MEETING, MeetingName="Quarterly Zyx"),
+        [{"AttendeeName": "Bob Quinn", "RankID": 2}, {"AttendeeName": "Juvenal", "RankID": 1}],
+    )
+    assert first.startswith(b"%PDF") and second.startswith(b"%PDF")
+    assert first != second
+
+def test_wide_signature_fits_the_cell(pdf_service):
+    pdf = FPDF()
+    pdf.add_page()
+    placed = []
+    pdf.image = lambda img, x, y, w=0, h=0: placed.append((x, y, w, h))
+    # A long flat stroke normalizes to about 768x38 px
+    pdf_service._draw_signature(pdf, "sig", 90, 50, prefetched={"sig": _png(Image.new("P", (768, 38)))})
+    pdf_service._draw_signature(pdf, "sig2", 90, 50, prefetched={"sig2": _png(Image.new("P", (200, 120)))})
+
+    (x1, _, w1, h1), (_, _, w2, h2) = placed
+    assert w1 == pytest.approx(pdf_service.SIG_MAX_W) and h1 < pdf_service.SIG_MAX_H
+    assert x1 + w1 <= 90 + 110
+    assert h2 == pytest.approx(pdf_service.SIG_MAX_H) and w2 < pdf_service.SIG_MAX_W
@@ -1,12 +1,16 @@
 import base64
+import time
 from io import BytesIO
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageDraw
 import requests
 
-from config import SIGNATURE_GAS_PREFIX, GAS_UPLOAD_URL, GAS_API_KEY
+from config import SIGNATURE_GAS_PREFIX, SIGNATURE_VEC_PREFIX, SIGNATURE_TARGET_HEIGHT_PX, GAS_UPLOAD_URL, GAS_API_KEY
+
+# A Google Sheets cell holds at most 50000 characters
+SIGNATURE_VEC_MAX_CHARS = 45000
 
 def safe_str(val) -> str:
     return str(val).strip()
@@ -41,35 +45,226 @@ def is_canvas_blank(image_data) -> bool:
     if image_data is None: return True
     return np.std(image_data) < 1.0
 
+def normalize_signature_image(image_data, target_height: int = SIGNATURE_TARGET_HEIGHT_PX, threshold: int = 245) -> bytes:
+    """
+    Turn the raw canvas RGBA array into a compact, PDF-ready PNG:
+    cropped to the strokes, 2-colour palette (transparent background, black ink),
+    and scaled down to target_height. Raises ValueError if there are no strokes.
+    """
+    arr = np.asarray(image_data).astype(np.uint8)
+    rgb = arr[..., :3]
+    alpha = arr[..., 3] if arr.shape[-1] == 4 else np.full(arr.shape[:2], 255, dtype=np.uint8)
+    ink = (alpha > 0) & (rgb.min(axis=-1) < threshold)
+    if not ink.any():
+        raise ValueError("Signature pad is empty.")
+
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    pad = 4
+    top, bottom = max(rows[0] - pad, 0), min(rows[-1] + pad + 1, ink.shape[0])
+    left, right = max(cols[0] - pad, 0), min(cols[-1] + pad + 1, ink.shape[1])
+
+    mask = Image.fromarray(ink[top:bottom, left:right].astype(np.uint8) * 255)
+    if mask.height > target_height:
+        new_w = max(1, round(mask.width * target_height / mask.height))
+        mask = mask.resize((new_w, target_height), Image.LANCZOS)
+
+    # Palette index 0 = transparent white, 1 = black ink (saved as a 1-bit PNG)
+    idx = (np.asarray(mask) >= 96).astype(np.uint8)
+    out = Image.frombytes("P", mask.size, idx.tobytes())
+    out.putpalette([255, 255, 255, 0, 0, 0])
+
+    buf = BytesIO()
+    out.save(buf, format="PNG", transparency=0, optimize=True)
+    return buf.getvalue()
+
+def is_normalized_signature(img: Image.Image) -> bool:
+    """True for images produced by normalize_signature_image (already transparent)."""
+    return img is not None and img.mode == "P" and "transparency" in img.info
+
+def _simplify_polyline(points: List[Tuple[int, int]], tolerance: float) -> List[Tuple[int, int]]:
+    """Ramer-Douglas-Peucker: drop points closer than tolerance to the simplified line."""
+    if len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        (x1, y1), (x2, y2) = points[start], points[end]
+        dx, dy = x2 - x1, y2 - y1
+        norm = (dx * dx + dy * dy) ** 0.5
+        max_dist, max_idx = 0.0, -1
+        for i in range(start + 1, end):
+            px, py = points[i]
+            if norm == 0:
+                dist = ((px - x1) ** 2 + (py - y1) ** 2) ** 0.5
+            else:
+                dist = abs(dy * px - dx * py + x2 * y1 - y2 * x1) / norm
+            if dist > max_dist:
+                max_dist, max_idx = dist, i
+        if max_dist > tolerance:
+            keep[max_idx] = True
+            stack.append((start, max_idx))
+            stack.append((max_idx, end))
+    return [p for p, k in zip(points, keep) if k]
+
+def encode_signature_strokes(json_data, tolerance: float = 1.0) -> str:
+    """
+    Encode the freedraw paths from st_canvas json_data as a compact vector payload
+    (without the vec: prefix). Coordinates are cropped to the stroke bounding box,
+    simplified, rounded to whole pixels and delta-encoded per stroke.
+    Returns "" if there are no strokes or the result would not fit in a sheet cell.
+    """
+    if not json_data:
+        return ""
+    strokes, stroke_width = [], 1
+    for obj in json_data.get("objects", []):
+        if obj.get("type") != "path":
+            continue
+        pts = []
+        for seg in obj.get("path", []):
+            # Every fabric.js path command ends with its target point (M x y, L x y, Q cx cy x y)
+            if len(seg) >= 3:
+                pt = (int(round(seg[-2])), int(round(seg[-1])))
+                if not pts or pts[-1] != pt:
+                    pts.append(pt)
+        if pts:
+            strokes.append(_simplify_polyline(pts, tolerance))
+            stroke_width = max(stroke_width, int(round(obj.get("strokeWidth", 1))))
+    if not strokes:
+        return ""
+
+    pad = stroke_width
+    all_x = [x for stroke in strokes for x, _ in stroke]
+    all_y = [y for stroke in strokes for _, y in stroke]
+    min_x, max_x = min(all_x) - pad, max(all_x) + pad
+    min_y, max_y = min(all_y) - pad, max(all_y) + pad
+
+    parts = [f"{max_x - min_x},{max_y - min_y},{stroke_width}"]
+    for stroke in strokes:
+        nums, prev_x, prev_y = [], min_x, min_y
+        for x, y in stroke:
+            nums.append(f"{x - prev_x},{y - prev_y}")
+            prev_x, prev_y = x, y
+        parts.append(",".join(nums))
+    payload = ";".join(parts)
+    if len(SIGNATURE_VEC_PREFIX) + len(payload) > SIGNATURE_VEC_MAX_CHARS:
+        return ""
+    return payload
+
+def decode_signature_strokes(payload: str) -> Tuple[int, int, int, List[List[Tuple[int, int]]]]:
+    """Inverse of encode_signature_strokes: (width, height, stroke_width, strokes)."""
+    parts = payload.split(";")
+    width, height, stroke_width = (int(v) for v in parts[0].split(","))
+    strokes = []
+    for part in parts[1:]:
+        nums = [int(v) for v in part.split(",") if v]
+        x = y = 0
+        pts = []
+        for i in range(0, len(nums) - 1, 2):
+            x += nums[i]
+            y += nums[i + 1]
+            pts.append((x, y))
+        if pts:
+            strokes.append(pts)
+    return width, height, stroke_width, strokes
+
+def vector_signature_to_image(payload: str) -> Optional[Image.Image]:
+    """Rasterize a vector payload in the same palette form as normalize_signature_image."""
+    try:
+        width, height, stroke_width, strokes = decode_signature_strokes(payload)
+    except Exception:
+        return None
+    img = Image.new("P", (max(width, 1), max(height, 1)), 0)
+    img.putpalette([255, 255, 255, 0, 0, 0])
+    draw = ImageDraw.Draw(img)
+    r = stroke_width / 2
+    for pts in strokes:
+        if len(pts) > 1:
+            draw.line(pts, fill=1, width=stroke_width, joint="curve")
+        x, y = pts[0]
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=1)
+    img.info["transparency"] = 0
+    return img
+
 def parse_signature_value(sig_val: str) -> Tuple[str, str]:
     if not sig_val:
         return ("empty", "")
     s = str(sig_val).strip()
     if s.startswith(SIGNATURE_GAS_PREFIX):
         return ("gas", s[len(SIGNATURE_GAS_PREFIX):].strip())
+    if s.startswith(SIGNATURE_VEC_PREFIX):
+        return ("vector", s[len(SIGNATURE_VEC_PREFIX):].strip())
     return ("base64", s)
 
-def _gas_download_file_as_image(file_id: str) -> Optional[Image.Image]:
+# Bridge protocol as last reported by the bridge itself (upload replies or a ping).
+# Uploads try protocol 2 first; a protocol-1 answer is remembered for a while so
+# older deployments don't pay a wasted request on every upload.
+_GAS_V1_RECHECK = 600
+_gas_protocol = {"version": 2, "at": 0.0}
+
+def gas_protocol_hint() -> int:
+    """Protocol to try first for uploads; no request is made."""
+    if _gas_protocol["version"] < 2 and time.time() - _gas_protocol["at"] > _GAS_V1_RECHECK:
+        return 2
+    return _gas_protocol["version"]
+
+def remember_gas_protocol(version: int):
+    _gas_protocol.update(version=version, at=time.time())
+
+def gas_ping() -> Tuple[bool, str, int]:
+    """(online, message, protocol version). Bridges older than protocol 2 don't report one -> 1."""
+    if not GAS_UPLOAD_URL:
+        return False, "Missing gas.upload_url", 1
+    try:
+        r = requests.get(GAS_UPLOAD_URL, params={"action": "ping"}, timeout=10)
+        r.raise_for_status()
+        js = r.json()
+    except Exception as e:
+        return False, str(e), 1
+    protocol = safe_int(js.get("protocol", 1), 1)
+    if js.get("ok"):
+        remember_gas_protocol(protocol)
+    return bool(js.get("ok")), js.get("message", ""), protocol
+
+def gas_download_file_bytes(file_id: str) -> Optional[bytes]:
     if not GAS_UPLOAD_URL or not GAS_API_KEY:
         return None
     try:
-        r = requests.get(
-            GAS_UPLOAD_URL,
-            params={"action": "download", "fileId": file_id, "api_key": GAS_API_KEY},
-            timeout=20,
-        )
+        # Protocol 2 bridges answer format=b64 with plain base64 text; older ones
+        # ignore it and reply with JSON, so the body is told apart by its shape.
+        params = {"action": "download", "fileId": file_id, "api_key": GAS_API_KEY, "format": "b64"}
+        r = requests.get(GAS_UPLOAD_URL, params=params, timeout=20)
         r.raise_for_status()
-        js = r.json()
-        if not js.get("ok"):
-            return None
-        data_b64 = js.get("data_base64", "")
+        if not r.text.lstrip().startswith("{"):
+            data_b64 = r.text.strip()
+        else:
+            js = r.json()
+            if not js.get("ok"):
+                return None
+            data_b64 = js.get("data_base64", "")
         if not data_b64:
             return None
-        data = base64.b64decode(data_b64)
+        return base64.b64decode(data_b64)
+    except Exception:
+        return None
+
+def _gas_download_file_as_image(file_id: str) -> Optional[Image.Image]:
+    data = gas_download_file_bytes(file_id)
+    if not data:
+        return None
+    try:
         return Image.open(BytesIO(data))
     except Exception:
         return None
 
+def export_filename(meeting_date, meeting_name, meeting_id, ext: str) -> str:
+    """<yyyymmdd>_<Meeting_Name>_<id>.<ext>, as used for QR and PDF downloads."""
+    clean_date = str(meeting_date).replace("-", "").replace("/", "")
+    clean_name = str(meeting_name).replace(" ", "_")
+    return f"{clean_date}_{clean_name}_{meeting_id}.{ext}"
+
 def image_from_signature_value(sig_val: str) -> Optional[Image.Image]:
     kind, payload = parse_signature_value(sig_val)
     if kind == "empty":
@@ -78,6 +273,8 @@ def image_from_signature_value(sig_val: str) -> Optional[Image.Image]:
         return base64_to_image(payload)
     if kind == "gas":
         return _gas_download_file_as_image(payload)
+    if kind == "vector":
+        return vector_signature_to_image(payload)
     return None
 
 def make_white_background_transparent(img: Image.Image, threshold: int = 245) -> Image.Image: